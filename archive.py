@@ -0,0 +1,430 @@
+"""
+Columnar, template-compressed log archive.
+
+Lines are written in time-partitioned blocks. Inside a block every line
+is stored as its pattern key ID, a timestamp and the variable parts of
+the line: the text around the literal pieces of its normalized
+template. Rows are sorted by (key, time), so the index can point at the
+row range for a key and a lookup is a block read plus a slice.
+
+Layout of an archive directory:
+
+    keys.json    pattern key ID -> [service, level, template]
+    index.json   per block: file, time range, key ID -> [first_row, rows, first_ms, last_ms]
+    block-*.blk  magic, header length, JSON header, zlib-compressed columns
+
+While the archive is being written, keys.jsonl and index.jsonl take the
+place of the two JSON files: one line per new key and per block,
+appended as blocks are closed. close() writes the consolidated files
+and removes the logs.
+
+Columns per block:
+
+    ts        int64   milliseconds since the block's start
+    nvars     uint16  variables per row (1 = line stored verbatim)
+    var_lens  uint32  byte length of each variable
+    var_data  bytes   concatenated UTF-8 variables
+"""
+import json
+import os
+import re
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from store import PatternKey
+from v3.types import EventBatch, LogEvent
+
+
+BLOCK_MAGIC = b"SOAB1"
+KEYS_LOG = "keys.jsonl"
+INDEX_LOG = "index.jsonl"
+TOKEN_RE = re.compile(r"<[A-Z_]+>")
+
+
+def template_pieces(template: str) -> List[str]:
+    """
+    Literal text of a template between its <TOKEN> placeholders.
+    """
+    return TOKEN_RE.split(template)
+
+
+def split_line(line: str, pieces: List[str]) -> Optional[List[str]]:
+    """
+    Cut line into the variables around pieces, so that
+    prefix + pieces[0] + v1 + pieces[1] + ... + suffix == line.
+    Returns None if the pieces do not occur in order.
+    """
+    variables = []
+    pos = 0
+    for piece in pieces:
+        idx = line.find(piece, pos)
+        if idx < 0:
+            return None
+        variables.append(line[pos:idx])
+        pos = idx + len(piece)
+    variables.append(line[pos:])
+    return variables
+
+
+def join_line(variables: List[str], pieces: List[str]) -> str:
+    if len(variables) != len(pieces) + 1:
+        return variables[0]
+    parts = [variables[0]]
+    for piece, value in zip(pieces, variables[1:]):
+        parts.append(piece)
+        parts.append(value)
+    return "".join(parts)
+
+
+def _pack(arr: array) -> bytes:
+    if sys.byteorder != "little":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _unpack(typecode: str, data: bytes) -> array:
+    arr = array(typecode)
+    arr.frombytes(data)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr
+
+
+def _write_json(path: str, doc):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(doc, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _read_jsonl(path: str) -> list:
+    """
+    Records of a .jsonl log; a torn last line (writer mid-append) is
+    skipped.
+    """
+    records = []
+    with open(path) as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            records.append(json.loads(line))
+    return records
+
+
+# ---------- Writer ----------
+
+class ArchiveWriter:
+    """
+    Append LogEvents to an archive directory.
+
+    A block is closed when it spans block_span of event time or holds
+    block_rows lines. Each closed block appends its new keys and its
+    index record to the .jsonl logs, so the archive is readable while it
+    is being written at a cost per block that does not grow with the
+    archive.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        block_span: timedelta = timedelta(minutes=10),
+        block_rows: int = 65536,
+        level: int = 6,
+    ):
+        self.path = path
+        self.block_span = block_span
+        self.block_rows = block_rows
+        self.level = level
+        os.makedirs(path, exist_ok=True)
+
+        self._keys: Dict[PatternKey, int] = {}
+        self._pieces: List[List[str]] = []
+        self._index: List[dict] = []
+        self._rows: List[Tuple[int, int, str]] = []  # (key_id, epoch ms, line)
+        self._block_start: Optional[int] = None
+
+        # Truncated here, so a stale consolidated index is never read
+        # in place of this run's blocks
+        self._keys_log = open(os.path.join(path, KEYS_LOG), "w")
+        self._index_log = open(os.path.join(path, INDEX_LOG), "w")
+        self._keys_logged = 0
+
+        self.lines = 0
+        self.verbatim = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _key_id(self, key: PatternKey) -> int:
+        key_id = self._keys.get(key)
+        if key_id is None:
+            key_id = self._keys[key] = len(self._keys)
+            self._pieces.append(template_pieces(key[2]))
+        return key_id
+
+    def add(self, event: LogEvent):
+        key_id = self._key_id((event.service, event.level, event.template))
+        self._append(key_id, int(event.timestamp.timestamp() * 1000), event.raw)
+
+    def add_batch(self, batch: EventBatch):
+        """
+        Append every row of an EventBatch straight from its columns.
+        """
+        # Batch codes -> archive key IDs, resolved once per batch
+        key_ids: Dict[Tuple[int, int, int], int] = {}
+        for service, level, template, epoch, raw in zip(
+            batch.services, batch.levels, batch.templates, batch.epochs, batch.raw
+        ):
+            code = (service, level, template)
+            key_id = key_ids.get(code)
+            if key_id is None:
+                key_id = key_ids[code] = self._key_id((
+                    batch.service_names[service],
+                    batch.level_names[level],
+                    batch.template_names[template],
+                ))
+            self._append(key_id, int(epoch * 1000), raw)
+
+    def _append(self, key_id: int, ms: int, line: str):
+        if self._block_start is None:
+            self._block_start = ms
+        elif (
+            ms - self._block_start >= self.block_span.total_seconds() * 1000
+            or len(self._rows) >= self.block_rows
+        ):
+            self.flush()
+            self._block_start = ms
+
+        self._rows.append((key_id, ms, line.rstrip("\n")))
+        self.lines += 1
+
+    def flush(self):
+        if not self._rows:
+            return
+
+        rows = sorted(self._rows, key=lambda r: (r[0], r[1]))
+        self._rows = []
+
+        base = min(r[1] for r in rows)
+        ts = array("q")
+        nvars = array("H")
+        var_lens = array("I")
+        var_data = bytearray()
+        keys: Dict[str, List[int]] = {}
+
+        for row, (key_id, ms, line) in enumerate(rows):
+            entry = keys.get(str(key_id))
+            if entry is None:
+                keys[str(key_id)] = [row, 1, ms, ms]
+            else:
+                entry[1] += 1
+                entry[3] = ms
+
+            variables = split_line(line, self._pieces[key_id])
+            if variables is None:
+                variables = [line]
+                self.verbatim += 1
+
+            ts.append(ms - base)
+            nvars.append(len(variables))
+            for value in variables:
+                encoded = value.encode("utf-8")
+                var_lens.append(len(encoded))
+                var_data += encoded
+            self.bytes_in += len(line) + 1
+
+        columns = {
+            "ts": _pack(ts),
+            "nvars": _pack(nvars),
+            "var_lens": _pack(var_lens),
+            "var_data": bytes(var_data),
+        }
+
+        header = {"rows": len(rows), "base_ms": base, "columns": {}}
+        blobs = []
+        offset = 0
+        for name, raw in columns.items():
+            blob = zlib.compress(raw, self.level)
+            header["columns"][name] = [offset, len(blob)]
+            blobs.append(blob)
+            offset += len(blob)
+
+        name = f"block-{base}-{len(self._index):06d}.blk"
+        header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        with open(os.path.join(self.path, name), "wb") as f:
+            f.write(BLOCK_MAGIC)
+            f.write(struct.pack("<I", len(header_bytes)))
+            f.write(header_bytes)
+            for blob in blobs:
+                f.write(blob)
+
+        self.bytes_out += len(BLOCK_MAGIC) + 4 + len(header_bytes) + offset
+        entry = {
+            "file": name,
+            "start_ms": base,
+            "end_ms": max(r[1] for r in rows),
+            "keys": keys,
+        }
+        self._index.append(entry)
+
+        # Keys first: an index record only refers to logged keys
+        for key in list(self._keys)[self._keys_logged:]:
+            self._keys_log.write(json.dumps(list(key), separators=(",", ":")) + "\n")
+        self._keys_logged = len(self._keys)
+        self._keys_log.flush()
+        self._index_log.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._index_log.flush()
+
+    def close(self):
+        if self._index_log.closed:
+            return
+        self.flush()
+
+        _write_json(
+            os.path.join(self.path, "keys.json"),
+            [list(k) for k in self._keys],
+        )
+        _write_json(os.path.join(self.path, "index.json"), self._index)
+
+        self._keys_log.close()
+        self._index_log.close()
+        os.remove(os.path.join(self.path, KEYS_LOG))
+        os.remove(os.path.join(self.path, INDEX_LOG))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ---------- Reader ----------
+
+class ArchiveReader:
+    """
+    Query an archive by pattern key and time range.
+    """
+
+    def __init__(self, path: str, cache_blocks: int = 4):
+        self.path = path
+        if os.path.exists(os.path.join(path, INDEX_LOG)):
+            # Still being written (or never closed)
+            keys = [tuple(k) for k in _read_jsonl(os.path.join(path, KEYS_LOG))]
+            self._index = _read_jsonl(os.path.join(path, INDEX_LOG))
+        else:
+            with open(os.path.join(path, "keys.json")) as f:
+                keys = [tuple(k) for k in json.load(f)]
+            with open(os.path.join(path, "index.json")) as f:
+                self._index = json.load(f)
+
+        self._key_ids: Dict[PatternKey, int] = {k: i for i, k in enumerate(keys)}
+        self._pieces = [template_pieces(k[2]) for k in keys]
+
+        self._cache: Dict[str, dict] = {}
+        self.cache_blocks = cache_blocks
+
+    def keys(self) -> List[PatternKey]:
+        return list(self._key_ids)
+
+    def _block(self, name: str) -> dict:
+        block = self._cache.get(name)
+        if block is not None:
+            return block
+
+        with open(os.path.join(self.path, name), "rb") as f:
+            data = f.read()
+        if not data.startswith(BLOCK_MAGIC):
+            raise ValueError(f"not an archive block: {name}")
+
+        pos = len(BLOCK_MAGIC)
+        (header_len,) = struct.unpack_from("<I", data, pos)
+        pos += 4
+        header = json.loads(data[pos:pos + header_len])
+        pos += header_len
+
+        def column(name: str) -> bytes:
+            offset, length = header["columns"][name]
+            return zlib.decompress(data[pos + offset:pos + offset + length])
+
+        nvars = _unpack("H", column("nvars"))
+        var_lens = _unpack("I", column("var_lens"))
+
+        # Row -> first variable, so a key's row range is a direct slice
+        var_start = array("I", [0])
+        for n in nvars:
+            var_start.append(var_start[-1] + n)
+        byte_start = array("Q", [0])
+        for n in var_lens:
+            byte_start.append(byte_start[-1] + n)
+
+        block = {
+            "base_ms": header["base_ms"],
+            "ts": _unpack("q", column("ts")),
+            "var_start": var_start,
+            "byte_start": byte_start,
+            "var_data": column("var_data"),
+        }
+
+        if len(self._cache) >= self.cache_blocks:
+            self._cache.pop(next(iter(self._cache)))
+        self._cache[name] = block
+        return block
+
+    def lines(
+        self,
+        key: PatternKey,
+        since: datetime,
+        until: datetime,
+        limit: Optional[int] = None,
+    ) -> Iterator[Tuple[datetime, str]]:
+        """
+        Lines of key with since <= timestamp <= until, oldest first per
+        block. Blocks that cannot contain the key or range are not read.
+        """
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            return
+
+        lo = int(since.timestamp() * 1000)
+        hi = int(until.timestamp() * 1000)
+        pieces = self._pieces[key_id]
+        emitted = 0
+
+        for entry in self._index:
+            if entry["end_ms"] < lo or entry["start_ms"] > hi:
+                continue
+            span = entry["keys"].get(str(key_id))
+            if span is None:
+                continue
+            first_row, rows, first_ms, last_ms = span
+            if last_ms < lo or first_ms > hi:
+                continue
+
+            block = self._block(entry["file"])
+            base = block["base_ms"]
+            ts = block["ts"]
+            var_start = block["var_start"]
+            byte_start = block["byte_start"]
+            data = block["var_data"]
+
+            for row in range(first_row, first_row + rows):
+                ms = base + ts[row]
+                if ms < lo:
+                    continue
+                if ms > hi:
+                    break
+                variables = [
+                    data[byte_start[v]:byte_start[v + 1]].decode("utf-8")
+                    for v in range(var_start[row], var_start[row + 1])
+                ]
+                yield (
+                    datetime.fromtimestamp(ms / 1000, tz=timezone.utc),
+                    join_line(variables, pieces),
+                )
+                emitted += 1
+                if limit is not None and emitted >= limit:
+                    return
@@ -0,0 +1,124 @@
+"""
+Adversarial-line corpus: checks that no parser, normalization rule or
+full ingest call has a per-line cost that grows without bound.
+
+    python -m bench.adversarial
+    python -m bench.adversarial --sizes 65536 1048576 --budget-ms 50
+
+Every fragment below is repeated to fill a line and wrapped in each
+log format. The check times:
+
+  parse  each parser on lines cut to MAX_LINE_CHARS (what it is given)
+  rule   each normalization rule on messages of MAX_MESSAGE_CHARS
+  ingest ingest_line_with_reason on the full-size line, caps applied
+
+It exits non-zero if any single call exceeds its budget.
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+
+from v3.ingest import MAX_LINE_CHARS, MAX_MESSAGE_CHARS, ingest_line_with_reason
+from v3.normalize import NORMALIZATION_RULES
+from v3.parsers import parse_json, parse_kv, parse_timestamped
+
+
+TS = "2026-01-03T14:00:01"
+
+# Partial matches, unclosed quotes and long runs that make regexes
+# backtrack or rescan
+FRAGMENTS = [
+    "a", "1", "1.", "1.1.", "-", " ", "=", '"', 'k="v ', "a=", "x==",
+    "violates constraint \"", "pod-", "request_id=", "_id=", "java.lang.",
+    "version=1.", "/users/", "timeout after 1", "slow response time=1",
+    "SQL error code ", "offset ", "partition ", "user_id=", " token",
+    "Traceback (most recent call last)", "deadbeef-", "GET", "1ms", "\\",
+]
+
+FORMATS = {
+    "text": lambda body: f"{TS} ERROR svc {body}",
+    "kv": lambda body: f"ts={TS} level=ERROR service=svc msg=\"{body}\" {body}",
+    "json": lambda body: json.dumps(
+        {"timestamp": TS, "level": "ERROR", "service": "svc", "message": body}
+    ),
+}
+
+PARSERS = {
+    "text": parse_timestamped,
+    "kv": parse_kv,
+    "json": parse_json,
+}
+
+
+def fill(fragment: str, size: int) -> str:
+    return (fragment * (size // len(fragment) + 1))[:size]
+
+
+def timed(fn: Callable[[], object]) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def run(sizes: List[int]) -> List[Tuple[str, str, str, int, float]]:
+    """
+    (check, target, fragment, size, seconds) for every call made.
+    """
+    rows = []
+
+    for fragment in FRAGMENTS:
+        message = fill(fragment, MAX_MESSAGE_CHARS)
+        for rule in NORMALIZATION_RULES:
+            seconds = timed(lambda: rule.pattern.sub(rule.token, message))
+            rows.append(("rule", rule.name, fragment, len(message), seconds))
+
+        for fmt, wrap in FORMATS.items():
+            line = wrap(fill(fragment, MAX_LINE_CHARS))[:MAX_LINE_CHARS]
+            parser = PARSERS[fmt]
+            rows.append(("parse", fmt, fragment, len(line), timed(lambda: parser(line))))
+
+            for size in sizes:
+                line = wrap(fill(fragment, size))
+                seconds = timed(lambda: ingest_line_with_reason(line))
+                rows.append(("ingest", fmt, fragment, len(line), seconds))
+
+    return rows
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Adversarial line benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[16 * 1024, 1024 * 1024],
+                        help="Line sizes for the ingest check")
+    parser.add_argument("--budget-ms", type=float, default=50.0,
+                        help="Limit for one parse or ingest call")
+    parser.add_argument("--rule-budget-ms", type=float, default=5.0,
+                        help="Limit for one rule on one message")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    rows = run(args.sizes)
+    budgets = {
+        "rule": args.rule_budget_ms / 1000,
+        "parse": args.budget_ms / 1000,
+        "ingest": args.budget_ms / 1000,
+    }
+
+    print(f"{'check':<7} {'target':<16} {'fragment':<24} {'chars':>9} {'ms':>9}")
+    for check in ("rule", "parse", "ingest"):
+        worst = sorted((r for r in rows if r[0] == check), key=lambda r: -r[4])
+        for _, target, fragment, chars, seconds in worst[: args.top]:
+            marker = "  OVER BUDGET" if seconds > budgets[check] else ""
+            print(f"{check:<7} {target:<16} {fragment[:24]!r:<24} {chars:>9} "
+                  f"{seconds * 1e3:>9.2f}{marker}")
+        print()
+
+    over = [r for r in rows if r[4] > budgets[r[0]]]
+    print(f"{len(rows)} calls, {len(over)} over budget")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
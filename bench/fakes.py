@@ -0,0 +1,87 @@
+"""
+Offline stand-ins used by benchmarks.
+"""
+import time
+
+
+FAKE_RESPONSE = """
+SUMMARY:
+Error volume for this pattern rose sharply in the recent window.
+
+WHY IT MATTERS:
+Requests on this path are likely failing for users.
+
+WHERE TO LOOK:
+- Recent changes to the affected service
+- Upstream dependencies in the same window
+
+CONFIDENCE:
+0.6
+"""
+
+
+class FakeLLM:
+    """
+    LLMClient that returns a fixed well-formed response after an optional
+    simulated latency.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self.prompt_chars = 0
+
+    def complete(self, prompt: str) -> str:
+        self.calls += 1
+        self.prompt_chars += len(prompt)
+        if self.latency:
+            time.sleep(self.latency)
+        return FAKE_RESPONSE
+
+
+class RateLimitError(RuntimeError):
+    """
+    What RateLimitedFakeLLM raises instead of an HTTP 429.
+    """
+
+
+class RateLimitedFakeLLM(FakeLLM):
+    """
+    FakeLLM that enforces provider-style limits: requests and tokens
+    (prompt + response, ~4 characters per token) per minute, replenished
+    continuously. Calls over the limit raise RateLimitError and are
+    counted in `rejected`.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        latency: float = 0.0,
+        clock=time.monotonic,
+    ):
+        super().__init__(latency)
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self.clock = clock
+        self.rejected = 0
+
+        self._requests = requests_per_minute
+        self._tokens = tokens_per_minute
+        self._updated = clock()
+
+    def complete(self, prompt: str) -> str:
+        now = self.clock()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+        tokens = (len(prompt) + len(FAKE_RESPONSE)) / 4
+        if self._requests < 1 or self._tokens < tokens:
+            self.rejected += 1
+            raise RateLimitError("429 Too Many Requests")
+
+        self._requests -= 1
+        self._tokens -= tokens
+        return super().complete(prompt)
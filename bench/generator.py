@@ -0,0 +1,241 @@
+"""
+Seeded synthetic production log generator.
+
+Produces a realistic mix of JSON, timestamped-text and logfmt lines with
+configurable template cardinality, level mix, high-cardinality noise
+(UUIDs, IPs, latencies), traffic spikes and deploy events.
+
+    python -m bench.generator --lines 100000 --seed 1 > synthetic.log
+"""
+import argparse
+import json
+import random
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+FORMATS = ("json", "text", "logfmt")
+
+DEFAULT_SERVICES = (
+    "user-service",
+    "payments",
+    "db-proxy",
+    "checkout",
+    "search",
+    "notifications",
+)
+
+DEFAULT_LEVEL_MIX: Dict[str, float] = {
+    "DEBUG": 0.10,
+    "INFO": 0.65,
+    "WARN": 0.15,
+    "ERROR": 0.10,
+}
+
+# Message shapes; {placeholders} are filled with per-line noise
+MESSAGE_SHAPES = (
+    "timeout after {ms}ms calling {svc}",
+    "slow response time={ms}ms path=/orders/{id}",
+    "request {uuid} completed in {ms}ms",
+    "GET /users/{id} returned {status}",
+    "POST /payments/{id} returned {status}",
+    "connection refused to {ip}:{port}",
+    "user_id={id} login failed: invalid token",
+    "kafka consumer lag offset {id} partition {small}",
+    "SQL error code {small} on table {table}",
+    "cache miss for key {table}:{id}",
+    "retrying job {uuid} attempt {small}",
+    "pod-{pod} evicted from node {ip}",
+    "query took {ms}ms rows={id}",
+    "java.lang.IllegalStateException in {table} handler",
+)
+
+TABLES = ("orders", "users", "payments", "sessions", "carts", "ledger")
+
+
+@dataclass
+class Spike:
+    """A burst where one template fires at `factor` times its usual rate."""
+    at: timedelta
+    duration: timedelta
+    template: int
+    factor: float = 20.0
+
+
+@dataclass
+class GeneratorConfig:
+    seed: int = 1
+    templates: int = 200
+    services: Sequence[str] = DEFAULT_SERVICES
+    level_mix: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_LEVEL_MIX))
+    format_mix: Dict[str, float] = field(
+        default_factory=lambda: {"json": 0.4, "text": 0.4, "logfmt": 0.2}
+    )
+    lines_per_second: float = 50.0
+    noise: bool = True
+    spikes: List[Spike] = field(default_factory=list)
+    deploys: List[Tuple[timedelta, str, str]] = field(default_factory=list)
+
+
+class LogGenerator:
+    def __init__(self, config: Optional[GeneratorConfig] = None):
+        self.config = config or GeneratorConfig()
+        self.rng = random.Random(self.config.seed)
+
+        # Fixed template universe: (service, shape, static suffix)
+        self._templates = [self._make_template(i) for i in range(self.config.templates)]
+
+        levels = list(self.config.level_mix)
+        self._levels = levels
+        self._level_weights = [self.config.level_mix[lv] for lv in levels]
+
+        formats = list(self.config.format_mix)
+        self._formats = formats
+        self._format_weights = [self.config.format_mix[f] for f in formats]
+
+    def _make_template(self, i: int) -> Tuple[str, str, str]:
+        rng = self.rng
+        service = self.config.services[i % len(self.config.services)]
+        shape = MESSAGE_SHAPES[rng.randrange(len(MESSAGE_SHAPES))]
+        # Suffix keeps templates distinct after normalization
+        return service, shape, f"[component-{chr(97 + i % 26)}{i // 26}]"
+
+    # ---------- Noise ----------
+
+    def _fill(self, shape: str, service: str) -> str:
+        rng = self.rng
+        if not self.config.noise:
+            return shape.format(
+                ms=100, svc=service, id=1, status=500, ip="10.0.0.1", port=5432,
+                uuid="00000000-0000-0000-0000-000000000000", small=1,
+                table="orders", pod="a1",
+            )
+
+        return shape.format(
+            ms=int(rng.lognormvariate(5.0, 0.8)),
+            svc=service,
+            id=rng.randrange(1, 10_000_000),
+            status=rng.choice((200, 201, 404, 500, 502, 503)),
+            ip=f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}",
+            port=rng.choice((5432, 6379, 9092, 443)),
+            uuid="%08x-%04x-%04x-%04x-%012x" % (
+                rng.getrandbits(32), rng.getrandbits(16), rng.getrandbits(16),
+                rng.getrandbits(16), rng.getrandbits(48),
+            ),
+            small=rng.randrange(0, 64),
+            table=rng.choice(TABLES),
+            pod="%x-%x" % (rng.getrandbits(24), rng.getrandbits(16)),
+        )
+
+    # ---------- Formatting ----------
+
+    @staticmethod
+    def format_line(fmt: str, ts: datetime, level: str, service: str, message: str) -> str:
+        stamp = ts.replace(tzinfo=None).isoformat(timespec="milliseconds")
+
+        if fmt == "json":
+            return json.dumps(
+                {"timestamp": stamp, "level": level, "service": service, "message": message}
+            )
+        if fmt == "logfmt":
+            escaped = message.replace('"', "'")
+            return f'ts={stamp} level={level} service={service} msg="{escaped}"'
+        return f"{stamp} {level} {service} {message}"
+
+    # ---------- Stream ----------
+
+    def lines(self, count: int, start: datetime) -> Iterator[str]:
+        """
+        Yield `count` lines with event times starting at `start`.
+        """
+        rng = self.rng
+        cfg = self.config
+        step = timedelta(seconds=1.0 / cfg.lines_per_second)
+
+        deploys = sorted(cfg.deploys)
+        next_deploy = 0
+        n_templates = len(self._templates)
+
+        for i in range(count):
+            offset = step * i
+            ts = start + offset
+
+            while next_deploy < len(deploys) and deploys[next_deploy][0] <= offset:
+                _, service, version = deploys[next_deploy]
+                next_deploy += 1
+                yield self.format_line(
+                    "text", ts, "INFO", "deploy-service",
+                    f"deployment completed service={service} version={version}",
+                )
+
+            template = None
+            for spike in cfg.spikes:
+                if spike.at <= offset < spike.at + spike.duration:
+                    # Share of traffic the spiking template takes over
+                    share = spike.factor / (spike.factor + n_templates)
+                    if rng.random() < share:
+                        template = spike.template
+                        level = "ERROR"
+                    break
+
+            if template is None:
+                # Zipf-ish popularity: a few templates dominate
+                template = min(int(rng.paretovariate(1.2)) - 1, n_templates - 1)
+                level = rng.choices(self._levels, self._level_weights)[0]
+
+            service, shape, suffix = self._templates[template]
+            message = f"{self._fill(shape, service)} {suffix}"
+            fmt = rng.choices(self._formats, self._format_weights)[0]
+
+            yield self.format_line(fmt, ts, level, service, message)
+
+
+def default_incident_config(
+    duration: timedelta,
+    seed: int = 1,
+    templates: int = 200,
+) -> GeneratorConfig:
+    """
+    A run with a deploy followed by an error spike in the last tenth, so
+    the detector has something to find when the run is chosen to end now.
+    """
+    return GeneratorConfig(
+        seed=seed,
+        templates=templates,
+        deploys=[(duration * 0.85, "payments", "2.7.1")],
+        spikes=[Spike(at=duration * 0.9, duration=duration * 0.1, template=1)],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic log generator")
+    parser.add_argument("--lines", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--templates", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=50.0, help="lines per second")
+    parser.add_argument(
+        "--end-now",
+        action="store_true",
+        help="Place the last line at the current time",
+    )
+    args = parser.parse_args()
+
+    duration = timedelta(seconds=args.lines / args.rate)
+    config = default_incident_config(duration, seed=args.seed, templates=args.templates)
+    config.lines_per_second = args.rate
+
+    start = (
+        datetime.now(timezone.utc) - duration
+        if args.end_now
+        else datetime(2026, 1, 3, 14, 0, tzinfo=timezone.utc)
+    )
+
+    out = sys.stdout
+    for line in LogGenerator(config).lines(args.lines, start):
+        out.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
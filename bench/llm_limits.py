@@ -0,0 +1,110 @@
+"""
+Scheduler scenario against a fake provider that enforces rate limits:
+
+    python -m bench.llm_limits
+
+Explains more anomalies than the limits and cost cap allow, on a
+simulated clock, and exits non-zero if the provider rejected any call
+or a less severe anomaly was explained while a more severe one was not.
+"""
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from bench.fakes import RateLimitedFakeLLM
+from context import AnomalyContextV2
+from detector import AnomalyV2
+from details import ExplainerV2, explain_within
+from scheduler import ScheduledLLM
+
+
+class SimClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+def contexts(n: int, seed: int) -> List[AnomalyContextV2]:
+    rng = random.Random(seed)
+    end = datetime.now(timezone.utc)
+    out = []
+    for i in range(n):
+        anomaly = AnomalyV2(
+            key=(f"svc-{i % 7}", "ERROR", f"failure {i} after <DURATION>"),
+            reason="spike",
+            severity=rng.uniform(1, 30),
+            recent_weighted=rng.uniform(10, 500),
+            baseline_weighted=rng.uniform(1, 10),
+            first_seen=end - timedelta(minutes=10),
+            last_seen=end,
+        )
+        related = {
+            (anomaly.key[0], "INFO", f"request {j} served"): rng.randint(1, 500)
+            for j in range(rng.randint(0, 60))
+        }
+        out.append(AnomalyContextV2(
+            anomaly=anomaly,
+            window_start=end - timedelta(minutes=5),
+            window_end=end,
+            related_patterns=related,
+            level_breakdown={"ERROR": 40, "INFO": 900},
+            deploy_event=None,
+            request_ids=[],
+        ))
+    return out
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="LLM scheduler scenario")
+    parser.add_argument("--anomalies", type=int, default=60)
+    parser.add_argument("--rpm", type=float, default=10)
+    parser.add_argument("--tpm", type=float, default=12_000)
+    parser.add_argument("--max-cost", type=float, default=0.05)
+    parser.add_argument("--deadline", type=float, default=120.0,
+                        help="Simulated seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    clock = SimClock()
+    provider = RateLimitedFakeLLM(args.rpm, args.tpm, clock=clock)
+    llm = ScheduledLLM(
+        provider,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        max_cost=args.max_cost,
+        prompt_cost_per_1k=0.001,
+        response_cost_per_1k=0.002,
+        deadline=args.deadline,
+        clock=clock,
+        sleep=clock.sleep,
+    )
+
+    ctxs = contexts(args.anomalies, args.seed)
+    explained, degraded = [], []
+    # One worker: the simulated clock is not shared safely across threads
+    for i, _, fallback in explain_within(ExplainerV2(llm), ctxs, workers=1):
+        (degraded if fallback else explained).append(ctxs[i].anomaly.severity)
+
+    print(f"anomalies          {len(ctxs)}")
+    print(f"explained by LLM   {len(explained)}")
+    print(f"local fallback     {len(degraded)}")
+    print(f"provider rejected  {provider.rejected}")
+    print(f"simulated seconds  {clock.now:.1f} (waited {llm.waited:.1f})")
+    print(f"spent              {llm.spent:.4f} of {args.max_cost:g}")
+
+    failed = provider.rejected > 0
+    if explained and degraded and min(explained) < max(degraded):
+        print("FAIL: a less severe anomaly was explained before a more severe one")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+End-to-end StackOracle benchmark suite.
+
+Runs micro benchmarks for each pipeline stage plus the full CLI with a
+fake LLM over a seeded synthetic corpus, and records results as JSON:
+
+    python -m bench.run --lines 50000 --out results.json
+    python -m bench.run --lines 50000 --compare results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from bench.fakes import FakeLLM
+from bench.generator import LogGenerator, default_incident_config
+
+
+RATE = 50.0  # synthetic lines per second of event time
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ---------- Harness ----------
+
+def measure(fn: Callable[[], int], repeat: int) -> Dict[str, float]:
+    """
+    Run fn `repeat` times; fn returns the number of operations it did.
+    Reports the best run, which is the least noisy estimate.
+    """
+    best = float("inf")
+    ops = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        ops = fn()
+        best = min(best, time.perf_counter() - t0)
+
+    return {
+        "ops": ops,
+        "seconds": best,
+        "ops_per_sec": ops / best if best else 0.0,
+        "us_per_op": best / ops * 1e6 if ops else 0.0,
+    }
+
+
+def corpus(lines: int, seed: int, templates: int) -> List[str]:
+    duration = timedelta(seconds=lines / RATE)
+    config = default_incident_config(duration, seed=seed, templates=templates)
+    config.lines_per_second = RATE
+    start = datetime.now(timezone.utc) - duration
+    return list(LogGenerator(config).lines(lines, start))
+
+
+# ---------- Benchmarks ----------
+
+def run_all(lines: List[str], repeat: int) -> Dict[str, Dict[str, float]]:
+    from context import ContextBuilderV2
+    from detector import AnomalyDetectorV2
+    from store import PatternStoreV2
+    from v3.detect import LogFormat, detect_format
+    from v3.ingest import ingest_line
+    from v3.normalize import normalize
+    from v3.parsers import parse_json, parse_kv, parse_timestamped
+
+    results: Dict[str, Dict[str, float]] = {}
+
+    # ---- Format detection ----
+    results["detect_format"] = measure(
+        lambda: sum(1 for line in lines if detect_format(line) is not None),
+        repeat,
+    )
+
+    # ---- Parsers, each over the lines of its own format ----
+    by_format = {fmt: [] for fmt in LogFormat}
+    for line in lines:
+        by_format[detect_format(line)].append(line)
+
+    parsers = {
+        "parse_json": (parse_json, by_format[LogFormat.JSON]),
+        "parse_timestamped": (parse_timestamped, by_format[LogFormat.TIMESTAMP_TEXT]),
+        "parse_kv": (parse_kv, by_format[LogFormat.KEY_VALUE]),
+    }
+    parsed = []
+    for name, (parser, subset) in parsers.items():
+        results[name] = measure(lambda: sum(1 for l in subset if parser(l)), repeat)
+        parsed.extend(p for p in map(parser, subset) if p)
+
+    # ---- Normalization ----
+    messages = [p.message for p in parsed]
+    results["normalize"] = measure(
+        lambda: sum(1 for m in messages if normalize(m) is not None),
+        repeat,
+    )
+
+    # ---- Store ----
+    events = [e for e in map(ingest_line, lines) if e]
+    events.sort(key=lambda e: e.timestamp)
+
+    def new_store():
+        return PatternStoreV2(
+            window_size=timedelta(minutes=10),
+            bucket_size=timedelta(minutes=1),
+        )
+
+    def fill():
+        store = new_store()
+        for e in events:
+            store.add(e)
+        return len(events)
+
+    results["store_add"] = measure(fill, repeat)
+
+    # ---- Batch ingest and counting ----
+    from v3.ingest import ingest_batch
+
+    chunks = [lines[i:i + 4096] for i in range(0, len(lines), 4096)]
+    results["ingest_batch"] = measure(
+        lambda: sum(len(ingest_batch(chunk)) for chunk in chunks),
+        repeat,
+    )
+
+    # Same time-sorted input as store_add
+    ordered = [e.raw for e in events]
+    batches = [ingest_batch(ordered[i:i + 4096]) for i in range(0, len(ordered), 4096)]
+
+    def fill_batches():
+        store = new_store()
+        return sum(store.add_batch(batch) for batch in batches)
+
+    results["store_add_batch"] = measure(fill_batches, repeat)
+
+    # ---- Replay under a pattern cap (evicted keys must be dropped) ----
+    from replay import ReplayDetector
+
+    def replay_capped():
+        store = PatternStoreV2(
+            window_size=timedelta(minutes=10),
+            bucket_size=timedelta(minutes=1),
+            max_patterns=max(1, len({(e.service, e.level, e.template) for e in events}) // 4),
+        )
+        detector = AnomalyDetectorV2(store, recent_window=timedelta(minutes=2), min_baseline=1.0)
+        ReplayDetector(store, detector).run(events)
+        return len(events)
+
+    results["replay_capped"] = measure(replay_capped, repeat)
+
+    store = new_store()
+    for e in events:
+        store.add(e)
+
+    # ---- Detection ----
+    now = datetime.now(timezone.utc)
+    detector = AnomalyDetectorV2(store, recent_window=timedelta(minutes=2), min_baseline=1.0)
+    results["detect"] = measure(lambda: (detector.detect(now), store.pattern_count())[1], repeat)
+
+    # ---- Context ----
+    anomalies, _ = detector.detect(now)
+    builder = ContextBuilderV2(store)
+    results["context_build"] = measure(
+        lambda: sum(1 for a in anomalies if builder.build(a)),
+        repeat,
+    )
+
+    # ---- Full pipeline ----
+    results["cli_pipeline"] = measure(lambda: run_cli(lines), repeat)
+
+    # ---- Cold start (fresh interpreters) ----
+    results["import_cli"] = best_of(lambda: import_seconds("cli"), repeat)
+    results["cli_cold_start"] = best_of(lambda: cold_start(lines[:1000]), repeat)
+
+    return results
+
+
+def best_of(fn: Callable[[], float], repeat: int) -> Dict[str, float]:
+    """
+    measure() for a callable that returns its own duration in seconds.
+    """
+    best = min(fn() for _ in range(repeat))
+    return {
+        "ops": 1,
+        "seconds": best,
+        "ops_per_sec": 1 / best if best else 0.0,
+        "us_per_op": best * 1e6,
+    }
+
+
+def import_seconds(module: str) -> float:
+    """
+    Cumulative import time of module in a fresh interpreter, as reported
+    by -X importtime.
+    """
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    for line in out.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1e6
+    raise RuntimeError(f"no importtime entry for {module}")
+
+
+def cold_start(lines: List[str]) -> float:
+    """
+    Wall time of `cli.py --no-llm` over a small file in a new process.
+    """
+    with tempfile.NamedTemporaryFile("w", suffix=".log", delete=False) as f:
+        f.write("\n".join(lines) + "\n")
+        path = f.name
+
+    try:
+        t0 = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "cli.py", "--log-file", path, "--no-llm"],
+            cwd=ROOT, stdout=subprocess.DEVNULL, check=True,
+        )
+        return time.perf_counter() - t0
+    finally:
+        os.unlink(path)
+
+
+def run_cli(lines: List[str]) -> int:
+    import cli
+
+    with tempfile.NamedTemporaryFile("w", suffix=".log", delete=False) as f:
+        f.write("\n".join(lines) + "\n")
+        path = f.name
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            cli.main(["--log-file", path], llm=FakeLLM())
+    finally:
+        os.unlink(path)
+
+    return len(lines)
+
+
+# ---------- Reporting ----------
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Names of benchmarks whose time per op regressed by more than tolerance.
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before or not before["us_per_op"]:
+            continue
+        change = result["us_per_op"] / before["us_per_op"] - 1.0
+        marker = "REGRESSION" if change > tolerance else ""
+        print(f"  {name:<18} {before['us_per_op']:>10.2f} -> "
+              f"{result['us_per_op']:>10.2f} us/op  {change:+7.1%}  {marker}")
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="StackOracle benchmark suite")
+    parser.add_argument("--lines", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--templates", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="Write results JSON here")
+    parser.add_argument("--compare", help="Baseline results JSON to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    lines = corpus(args.lines, args.seed, args.templates)
+    results = run_all(lines, args.repeat)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "lines": args.lines,
+            "seed": args.seed,
+            "templates": args.templates,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    print(f"{'benchmark':<18} {'ops':>8} {'seconds':>9} {'us/op':>10} {'ops/s':>12}")
+    for name, r in results.items():
+        print(f"{name:<18} {r['ops']:>8} {r['seconds']:>9.3f} "
+              f"{r['us_per_op']:>10.2f} {r['ops_per_sec']:>12.0f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare}:")
+        if compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,36 @@
 import argparse
+import contextlib
+import functools
+import itertools
+import json
+import time
 from datetime import datetime, timedelta, timezone
 
 from severity import severity_label
 
-from v3.ingest import ingest_line
-from store import PatternStoreV2
-from detector import AnomalyDetectorV2
+from v3.ingest import (
+    MAX_LINE_CHARS,
+    MAX_MESSAGE_CHARS,
+    TRUNCATED_LINES,
+    TRUNCATED_MESSAGES,
+    ingest_batch,
+    ingest_line_with_reason,
+)
+from v3.normalize import enable_rule_stats, rule_stats
+from store import DEFAULT_ROLLUPS, PatternStoreV2
+from detector import BASELINE_MODES, AnomalyDetectorV2
 from context import ContextBuilderV2, DeployEvent
-from details import ExplainerV2
-from openrouter import OpenRouterLLM
+from correlation import RequestIndex
+from incidents import Incident, group_anomalies
+from details import ExplainerV2, explain_within, local_explanation
+
+
+BATCH_LINES = 4096
 
 
 # ---------------- CLI ----------------
 
-def parse_args():
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(
         description="AI Log-Whisperer — Production Debug Copilot"
     )
@@ -22,6 +39,196 @@ def parse_args():
     parser.add_argument("--recent-minutes", type=int, default=2)
     parser.add_argument("--context-minutes", type=int, default=5)
     parser.add_argument("--max-anomalies", type=int, default=5)
+    parser.add_argument(
+        "--max-lateness-seconds",
+        type=int,
+        default=60,
+        help="Accept out-of-order events up to this far behind the newest one",
+    )
+    parser.add_argument(
+        "--max-patterns-per-service",
+        type=int,
+        default=None,
+        help="Bound memory: keep exact buckets only for the top-K patterns "
+             "per service, estimate the rest with a Count-Min sketch",
+    )
+    parser.add_argument(
+        "--idle-ttl-minutes",
+        type=int,
+        default=None,
+        help="Evict patterns with no events for this long (event time)",
+    )
+    parser.add_argument("--max-patterns", type=int, default=None)
+    parser.add_argument(
+        "--max-store-mb",
+        type=float,
+        default=None,
+        help="Approximate memory budget for the pattern store",
+    )
+
+    parser.add_argument(
+        "--rollups",
+        action="store_true",
+        help="Keep 10m/1d and 1h/7d rollups of aged buckets",
+    )
+    parser.add_argument(
+        "--baseline",
+        choices=BASELINE_MODES,
+        default="window",
+        help="Baseline to compare recent activity against "
+             "(long / hour_of_day need --rollups)",
+    )
+
+    parser.add_argument(
+        "--vectorized",
+        action="store_true",
+        help="Run detection as one NumPy pass over all patterns",
+    )
+
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help=f"Ingest and count in columnar batches of {BATCH_LINES} lines",
+    )
+
+    parser.add_argument(
+        "--no-grouping",
+        action="store_true",
+        help="Explain every anomaly separately instead of one explanation "
+             "per incident",
+    )
+
+    parser.add_argument(
+        "--no-llm",
+        action="store_true",
+        help="Do not call an LLM; report facts with local summaries only",
+    )
+    parser.add_argument(
+        "--llm-deadline",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Print every anomaly's facts first, then explanations as they "
+             "arrive; after SECONDS, fall back to a local summary",
+    )
+
+    parser.add_argument(
+        "--llm-rpm",
+        type=float,
+        default=None,
+        help="Client-side limit on LLM requests per minute",
+    )
+    parser.add_argument(
+        "--llm-tpm",
+        type=float,
+        default=None,
+        help="Client-side limit on LLM tokens (prompt + response) per minute",
+    )
+    parser.add_argument(
+        "--llm-max-cost",
+        type=float,
+        default=None,
+        help="Stop calling the LLM once estimated spend would pass this; "
+             "needs --llm-prompt-price / --llm-response-price",
+    )
+    parser.add_argument("--llm-prompt-price", type=float, default=0.0,
+                        help="Price per 1000 prompt tokens")
+    parser.add_argument("--llm-response-price", type=float, default=0.0,
+                        help="Price per 1000 response tokens")
+
+    parser.add_argument(
+        "--cross-service",
+        action="store_true",
+        help="Add patterns from other services whose per-bucket counts "
+             "correlate with each anomaly (NumPy)",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print a per-stage timing breakdown",
+    )
+    parser.add_argument(
+        "--profile-dump",
+        metavar="PATH",
+        help="With --profile, also write cProfile stats (pstats format)",
+    )
+
+    parser.add_argument(
+        "--rule-stats",
+        metavar="PATH",
+        help="Write per-rule normalization hit/cost statistics as JSON",
+    )
+
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve Prometheus metrics on 127.0.0.1:PORT/metrics while running",
+    )
+
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Partition patterns by service across N worker processes",
+    )
+
+    parser.add_argument(
+        "--latency",
+        action="store_true",
+        help="Capture durations (e.g. 350ms) per pattern and flag patterns "
+             "whose p99 at least doubles",
+    )
+
+    parser.add_argument(
+        "--max-line-chars",
+        type=int,
+        default=MAX_LINE_CHARS,
+        help="Cut longer lines before parsing (longer JSON lines are rejected)",
+    )
+    parser.add_argument(
+        "--max-message-chars",
+        type=int,
+        default=MAX_MESSAGE_CHARS,
+        help="Longer messages get a template from their first characters only",
+    )
+
+    parser.add_argument(
+        "--multiline",
+        action="store_true",
+        help="Fold stack traces and other continuation lines into the "
+             "event line before them",
+    )
+
+    parser.add_argument(
+        "--exemplars",
+        type=int,
+        default=0,
+        help="Sampled raw lines kept per pattern for prompts and reports "
+             "(default: 0, off)",
+    )
+
+    parser.add_argument(
+        "--archive",
+        metavar="DIR",
+        help="Write ingested lines to a compressed archive in DIR and show "
+             "sample lines for each anomaly in the report",
+    )
+    parser.add_argument(
+        "--sample-lines",
+        type=int,
+        default=3,
+        help="Lines per anomaly to show in the report (from --archive "
+             "if given, otherwise from the sampled exemplars)",
+    )
+
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Replay the file in event time, evaluating detection at every "
+             "bucket boundary, and print when each anomaly fired and cleared",
+    )
 
     parser.add_argument(
         "--demo",
@@ -29,7 +236,7 @@ def parse_args():
         help="Relax thresholds for small log samples (demo only)",
     )
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
 # ---------------- Helpers ----------------
@@ -61,56 +268,376 @@ def extract_deploy_events(events):
     return deploys
 
 
+def ingest_batches(
+    lines, args, store, profiler, ingest_stats, failure_reasons,
+    deploy_candidates, archive, request_index,
+):
+    """
+    --batch ingest loop: EventBatches into store.add_batch(). Only rows
+    other consumers need are turned into LogEvents.
+    """
+    ingest = ingest_batch
+    if profiler:
+        ingest = profiler.wrap("ingest", ingest)
+
+    lines = iter(lines)
+    while True:
+        chunk = list(itertools.islice(lines, BATCH_LINES))
+        if not chunk:
+            break
+
+        batch = ingest(
+            chunk,
+            capture_values=args.latency,
+            max_line_chars=args.max_line_chars,
+            max_message_chars=args.max_message_chars,
+        )
+        ingest_stats["parsed"] += len(batch)
+        ingest_stats["failed"] += batch.lines - len(batch)
+        for reason, count in batch.failures.items():
+            failure_reasons[reason] = failure_reasons.get(reason, 0) + count
+
+        store.add_batch(batch)
+
+        if archive:
+            archive.add_batch(batch)
+
+        if "deploy-service" in batch.service_names:
+            deploy_id = batch.service_names.index("deploy-service")
+            deploy_candidates.extend(
+                batch.event(row)
+                for row, service in enumerate(batch.services)
+                if service == deploy_id
+            )
+
+        for row, (rid, tid) in enumerate(zip(batch.request_ids, batch.trace_ids)):
+            if rid or tid:
+                request_index.add(batch.event(row))
+
+
+def print_timeline(timeline, evaluations):
+    print(f"\nReplay timeline ({len(timeline)} anomalies, "
+          f"{evaluations} pattern evaluations)")
+
+    if not timeline:
+        print("  No anomalies fired during replay.")
+        return
+
+    for t in timeline:
+        svc, level, template = t.key
+        cleared = t.cleared_at.isoformat() if t.cleared_at else "still active"
+        print(
+            f"  {t.fired_at.isoformat()} -> {cleared}  "
+            f"{severity_label(t.peak_severity).value:<8} {t.reason:<11} "
+            f"{svc} {level} {template}"
+        )
+
+
+def print_facts(idx, incident, ctx, samples):
+    """
+    Everything in an incident's report that does not need the LLM.
+    """
+    anomaly = incident.lead
+    svc, level, template = anomaly.key
+    sev = severity_label(anomaly.severity)
+
+    print("\n" + "─" * 60)
+    print(f"#{idx} {sev}  {svc}  {level}")
+    print(f"Pattern : {template}")
+    print(f"Reason  : {anomaly.reason}")
+    if anomaly.reason == "latency_shift":
+        print(f"p99     : {anomaly.recent_weighted:.0f}ms "
+              f"(baseline {anomaly.baseline_weighted:.0f}ms)")
+
+    if ctx.deploy_event:
+        print(
+            f"Deploy  : {ctx.deploy_event.service} "
+            f"{ctx.deploy_event.version}"
+        )
+
+    if incident.related:
+        print(f"\nAlso in this incident ({len(incident.related)})")
+        for other in incident.related[:5]:
+            o_svc, o_level, o_template = other.key
+            print(f"  {severity_label(other.severity).value:<8} "
+                  f"{other.reason:<13} {o_svc} {o_level} {o_template}")
+        if len(incident.related) > 5:
+            print(f"  ... {len(incident.related) - 5} more")
+
+    if samples:
+        print("\nSample lines")
+        for line in samples:
+            print(f"  {line}")
+
+    if ctx.co_moving_patterns:
+        print("\nMoves with (other services)")
+        for (c_svc, c_level, c_template), (corr, lag) in list(
+            ctx.co_moving_patterns.items()
+        )[:3]:
+            print(f"  r={corr:.2f} lag={lag:+d}  {c_svc} {c_level} {c_template}")
+
+    if ctx.correlated_patterns:
+        print("\nShares request IDs with")
+        for (c_svc, c_level, c_template), shared in list(
+            ctx.correlated_patterns.items()
+        )[:3]:
+            print(f"  {shared:>4}  {c_svc} {c_level} {c_template}")
+
+
+def print_explanation(explanation, fallback=None):
+    if fallback:
+        print(f"\n(local summary, {fallback})")
+
+    print("\nSummary")
+    print(explanation.summary)
+
+    print("\nWhy it matters")
+    print(explanation.why_it_matters)
+
+    print("\nWhere to look")
+    print(explanation.where_to_look)
+
+    if explanation.prompt_tokens:
+        print(f"\nTokens  : ~{explanation.prompt_tokens} prompt, "
+              f"~{explanation.response_tokens} response")
+
+
+def build_explainer(args, llm=None):
+    """
+    Explainer over the given client, or OpenRouter (imported here: it
+    loads .env and needs an API key), behind ScheduledLLM when any
+    client-side limit is set. Returns (explainer, scheduler or None).
+    """
+    if llm is None:
+        from openrouter import OpenRouterLLM
+        llm = OpenRouterLLM()
+
+    scheduled = None
+    if args.llm_rpm or args.llm_tpm or args.llm_max_cost is not None:
+        from scheduler import ScheduledLLM
+        llm = scheduled = ScheduledLLM(
+            llm,
+            requests_per_minute=args.llm_rpm,
+            tokens_per_minute=args.llm_tpm,
+            max_cost=args.llm_max_cost,
+            prompt_cost_per_1k=args.llm_prompt_price,
+            response_cost_per_1k=args.llm_response_price,
+        )
+
+    return ExplainerV2(llm), scheduled
+
+
 # ---------------- Main ----------------
 
-def main():
-    args = parse_args()
+def main(argv=None, llm=None):
+    args = parse_args(argv)
 
+    if not args.profile:
+        run(args, llm)
+        return
+
+    import cProfile
+    from profiling import StageProfiler
+
+    profiler = StageProfiler()
+    cprofile = cProfile.Profile() if args.profile_dump else None
+
+    try:
+        if cprofile:
+            cprofile.enable()
+        run(args, llm, profiler)
+    finally:
+        if cprofile:
+            cprofile.disable()
+            cprofile.dump_stats(args.profile_dump)
+        profiler.close()
+        profiler.report()
+
+
+def run(args, llm=None, profiler=None):
+    with contextlib.ExitStack() as cleanup:
+        _run(args, llm, profiler, cleanup)
+
+
+def _run(args, llm, profiler, cleanup):
     ingest_stats = {
         "parsed": 0,
         "failed": 0,
-        "unrecognized_format": 0,
     }
+    failure_reasons = {}
+
+    # The counters are process-wide; report only this run's share
+    truncated_before = (TRUNCATED_LINES.value, TRUNCATED_MESSAGES.value)
 
-    all_events = []
+    if args.metrics_port is not None and args.shards > 1:
+        # Store gauges and detection timings live in the worker processes
+        raise SystemExit("--metrics-port does not support --shards")
+
+    if args.metrics_port is not None:
+        from metrics import start_http_server
+        start_http_server(args.metrics_port)
+
+    # Only deploy-service events are kept; the full stream goes to --archive
+    deploy_candidates = []
 
     window = timedelta(minutes=args.window_minutes)
     recent = timedelta(minutes=args.recent_minutes)
     context_window = timedelta(minutes=args.context_minutes)
 
-    store = PatternStoreV2(
+    store_kwargs = dict(
         window_size=window,
         bucket_size=timedelta(minutes=1),
+        allowed_lateness=timedelta(seconds=args.max_lateness_seconds),
+        max_patterns_per_service=args.max_patterns_per_service,
+        idle_ttl=(
+            timedelta(minutes=args.idle_ttl_minutes)
+            if args.idle_ttl_minutes is not None
+            else None
+        ),
+        max_patterns=args.max_patterns,
+        max_bytes=(
+            int(args.max_store_mb * 1024 * 1024)
+            if args.max_store_mb is not None
+            else None
+        ),
+        rollups=DEFAULT_ROLLUPS if args.rollups else (),
+        exemplars=args.exemplars,
+        track_values=args.latency,
     )
 
     # 👇 THIS IS THE KEY LINE
     min_baseline = 0.1 if args.demo else 1.0
 
-    detector = AnomalyDetectorV2(
-        store=store,
+    detector_kwargs = dict(
         recent_window=recent,
         min_baseline=min_baseline,
+        baseline=args.baseline,
+        latency_multiplier=2.0 if args.latency else None,
     )
 
+    if args.batch and (args.replay or args.shards > 1):
+        raise SystemExit("--batch does not support --replay or --shards")
+    if args.batch and (
+        args.max_patterns is not None
+        or args.max_patterns_per_service is not None
+        or args.max_store_mb is not None
+    ):
+        # Grouped counting evicts in a different order from per-line adds
+        raise SystemExit(
+            "--batch does not support --max-patterns, "
+            "--max-patterns-per-service or --max-store-mb"
+        )
+
+    if args.replay and args.baseline != "window":
+        raise SystemExit("--replay supports only --baseline window")
+
+    if args.shards > 1:
+        if args.replay:
+            raise SystemExit("--replay does not support --shards")
+        if args.cross_service:
+            raise SystemExit("--cross-service does not support --shards")
+
+        from sharding import ShardedStore
+
+        # The coordinator ingests, detects and answers context queries
+        store = ShardedStore(
+            args.shards,
+            store_kwargs,
+            detector_kwargs,
+            vectorized=args.vectorized,
+        )
+        cleanup.callback(store.close)
+        detector = store
+    else:
+        store = PatternStoreV2(**store_kwargs)
+
+        detector_cls = AnomalyDetectorV2
+        if args.vectorized:
+            from vectorized import VectorizedDetectorV2
+            detector_cls = VectorizedDetectorV2
+
+        detector = detector_cls(store=store, **detector_kwargs)
+
+    request_index = RequestIndex(window)
+
+    series_correlator = None
+    if args.cross_service:
+        from comovement import SeriesCorrelator
+        series_correlator = SeriesCorrelator(store)
+
     context_builder = ContextBuilderV2(
         store=store,
         context_window=context_window,
+        request_index=request_index,
+        series_correlator=series_correlator,
     )
 
-    explainer = ExplainerV2(OpenRouterLLM())
+
+    if args.rule_stats:
+        enable_rule_stats()
+
+    ingest = functools.partial(
+        ingest_line_with_reason,
+        capture_values=args.latency,
+        max_line_chars=args.max_line_chars,
+        max_message_chars=args.max_message_chars,
+    )
+    if profiler:
+        from profiling import instrument
+        instrument(profiler, store, detector, context_builder)
+        ingest = profiler.wrap("ingest", ingest)
+
+    archive = None
+    if args.archive:
+        from archive import ArchiveWriter
+        archive = ArchiveWriter(args.archive)
+        cleanup.callback(archive.close)
+
+    replayer = None
+    if args.replay:
+        from replay import ReplayDetector
+        replayer = ReplayDetector(store, detector)
 
     # ---- Ingest ----
+    assembler = None
     with open(args.log_file) as f:
-        for line in f:
-            event = ingest_line(line)
+        lines = profiler.timed_iter("read", f) if profiler else f
+        if args.multiline:
+            from v3.multiline import LineAssembler, assemble
+            assembler = LineAssembler()
+            lines = assemble(lines, assembler)
+        if args.batch:
+            ingest_batches(
+                lines, args, store, profiler, ingest_stats, failure_reasons,
+                deploy_candidates, archive, request_index,
+            )
+            lines = ()
+
+        for line in lines:
+            event, reason = ingest(line)
             if not event:
                 ingest_stats["failed"] += 1
-                ingest_stats["unrecognized_format"] += 1
+                failure_reasons[reason] = failure_reasons.get(reason, 0) + 1
                 continue
 
             ingest_stats["parsed"] += 1
-            all_events.append(event)
-            store.add(event)
+            if event.service == "deploy-service":
+                deploy_candidates.append(event)
+            if archive:
+                archive.add(event)
+            if event.request_id or event.trace_id:
+                request_index.add(event)
+            if replayer:
+                replayer.add(event)
+            else:
+                store.add(event)
+
+    if archive:
+        archive.close()
+
+    if args.rule_stats:
+        with open(args.rule_stats, "w") as f:
+            json.dump(rule_stats(), f, indent=2)
 
     # ---- Ingest summary ----
     print("\nIngestion summary")
@@ -119,7 +646,44 @@ def main():
 
     if ingest_stats["failed"]:
         print("  Failure reasons:")
-        print(f"    unrecognized_format: {ingest_stats['unrecognized_format']}")
+        for reason, count in failure_reasons.items():
+            print(f"    {reason}: {count}")
+
+    if assembler and assembler.folded:
+        print(f"  Multi-line  : {assembler.folded} continuation lines folded"
+              + (f", {assembler.truncated} dropped (too long)"
+                 if assembler.truncated else ""))
+
+    truncated_lines = TRUNCATED_LINES.value - truncated_before[0]
+    truncated_messages = TRUNCATED_MESSAGES.value - truncated_before[1]
+    if truncated_lines or truncated_messages:
+        print(f"  Truncated   : {truncated_lines:.0f} lines, "
+              f"{truncated_messages:.0f} messages (over length limits)")
+
+    if store.late_accepted or store.late_rejected:
+        print(f"  Late events : {store.late_accepted} accepted, "
+              f"{store.late_rejected} rejected (beyond watermark)")
+
+    print(f"  Patterns    : {store.pattern_count()} "
+          f"(~{store.estimate_bytes() / 1024:.0f} KiB)")
+
+    if len(request_index):
+        print(f"  Request IDs : {len(request_index)} tracked "
+              f"(~{request_index.estimate_bytes() / 1024:.0f} KiB)")
+
+    if archive and archive.bytes_in:
+        print(f"  Archive     : {archive.lines} lines, "
+              f"{archive.bytes_in / 1024:.0f} KiB -> {archive.bytes_out / 1024:.0f} KiB")
+
+    evicted = {k: v for k, v in store.evictions.items() if v}
+    if evicted:
+        print("  Evicted patterns:")
+        for reason, count in evicted.items():
+            print(f"    {reason}: {count}")
+
+    if replayer:
+        print_timeline(replayer.finish(), replayer.evaluations)
+        return
 
     # ---- Detect anomalies ----
     now = datetime.now(timezone.utc)
@@ -149,56 +713,121 @@ def main():
     print(f"\nDetected {len(anomalies)} anomalies.")
 
     # ---- Deploy correlation ----
-    deploy_events = extract_deploy_events(all_events)
+    deploy_events = extract_deploy_events(deploy_candidates)
+
+    reader = None
+    if archive:
+        from archive import ArchiveReader
+        reader = ArchiveReader(args.archive)
+
+    # ---- Incidents ----
+    if args.no_grouping:
+        error_services = {
+            a.key[0] for a in anomalies if a.key[1] == "ERROR"
+        }
+        incidents = [
+            Incident(anomalies=[a])
+            for a in anomalies
+            if not (a.key[1] == "WARN" and a.key[0] in error_services)
+        ]
+    else:
+        incidents = group_anomalies(
+            anomalies,
+            store=store,
+            deploy_events=deploy_events,
+            context_window=context_window,
+        )
+        print(f"Grouped into {len(incidents)} incidents.")
 
     # ---- Report ----
     print("\n=== ANOMALY REPORT ===")
 
-    error_services = {
-        a.key[0] for a in anomalies if a.key[1] == "ERROR"
-    }
-
-    for idx, anomaly in enumerate(anomalies[: args.max_anomalies], 1):
-        svc, level, template = anomaly.key
-
-        if level == "WARN" and svc in error_services:
-            continue
-
-        ctx = context_builder.build(
-            anomaly,
+    incidents = incidents[: args.max_anomalies]
+    contexts = [
+        context_builder.build(
+            incident.lead,
             deploy_events=deploy_events,
+            incident_anomalies=incident.related,
         )
-
+        for incident in incidents
+    ]
+
+    def samples(ctx):
+        if args.sample_lines <= 0:
+            return []
+        if reader:
+            return [line for _, line in reader.lines(
+                ctx.anomaly.key,
+                ctx.window_start,
+                ctx.window_end,
+                limit=args.sample_lines,
+            )]
+        return [e.line for e in ctx.exemplars[-args.sample_lines:]]
+
+    # ---- LLM backend, only built once there is something to explain ----
+    explainer, scheduled = None, None
+    fallback = "--no-llm"
+    if not args.no_llm:
         try:
-            explanation = explainer.explain(ctx)
-        except Exception as e:
-            print("\n[LLM ERROR]")
-            print(str(e))
-            continue
-
-        sev = severity_label(anomaly.severity)
-
-        print("\n" + "─" * 60)
-        print(f"#{idx} {sev}  {svc}  {level}")
-        print(f"Pattern : {template}")
-        print(f"Reason  : {anomaly.reason}")
-
-        if ctx.deploy_event:
-            print(
-                f"Deploy  : {ctx.deploy_event.service} "
-                f"{ctx.deploy_event.version}"
-            )
-
-        print("\nSummary")
-        print(explanation.summary)
-
-        print("\nWhy it matters")
-        print(explanation.why_it_matters)
-
-        print("\nWhere to look")
-        print(explanation.where_to_look)
-
-        print("─" * 60)
+            explainer, scheduled = build_explainer(args, llm)
+        except ValueError as e:
+            # e.g. OPENROUTER_API_KEY not set
+            print(f"\nLLM unavailable ({e}); using local summaries.")
+            fallback = "LLM unavailable"
+    if explainer and profiler:
+        from profiling import instrument_explainer
+        instrument_explainer(profiler, explainer)
+
+    explained = []
+    if explainer is None:
+        for idx, (incident, ctx) in enumerate(zip(incidents, contexts), 1):
+            print_facts(idx, incident, ctx, samples(ctx))
+            print_explanation(local_explanation(ctx), fallback)
+            print("─" * 60)
+    elif args.llm_deadline is None:
+        for idx, (incident, ctx) in enumerate(zip(incidents, contexts), 1):
+            print_facts(idx, incident, ctx, samples(ctx))
+
+            fallback = None
+            try:
+                explanation = explainer.explain(ctx)
+            except Exception as e:
+                print("\n[LLM ERROR]")
+                print(str(e))
+                explanation = local_explanation(ctx)
+                fallback = "LLM error"
+
+            print_explanation(explanation, fallback)
+            print("─" * 60)
+            explained.append(explanation)
+    else:
+        # Deterministic facts first; explanations fill in as they arrive
+        for idx, (incident, ctx) in enumerate(zip(incidents, contexts), 1):
+            print_facts(idx, incident, ctx, samples(ctx))
+            print("─" * 60)
+
+        print(f"\n=== EXPLANATIONS (deadline {args.llm_deadline:g}s) ===")
+        if scheduled:
+            # Do not wait on rate limits past the report deadline
+            scheduled.deadline = time.monotonic() + args.llm_deadline
+        for i, explanation, fallback in explain_within(
+            explainer, contexts, deadline=args.llm_deadline
+        ):
+            svc, level, _ = incidents[i].lead.key
+            print("\n" + "─" * 60)
+            print(f"#{i + 1} {svc}  {level}")
+            print_explanation(explanation, fallback)
+            print("─" * 60)
+            explained.append(explanation)
+
+    prompt_tokens = sum(e.prompt_tokens for e in explained)
+    if prompt_tokens:
+        calls = sum(1 for e in explained if e.prompt_tokens)
+        print(f"\nLLM usage: {calls} calls, ~{prompt_tokens} prompt tokens, "
+              f"~{sum(e.response_tokens for e in explained)} response tokens")
+    if scheduled:
+        print(f"LLM limits: {scheduled.refused} calls refused, "
+              f"{scheduled.waited:.1f}s waited, spent ~{scheduled.spent:.4f}")
 
     print("\nDone.")
 
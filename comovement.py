@@ -0,0 +1,122 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from store import PatternKey, PatternStoreV2
+from vectorized import bucket_matrix
+
+
+class SeriesCorrelator:
+    """
+    Lagged correlation between a pattern's bucket series and patterns in
+    other services, computed over the store's fine buckets in the window
+    ending at the newest event.
+
+    refresh() builds one matrix of mean-centred, unit-norm rows for the
+    active patterns: at least min_events in the window and a coefficient
+    of variation of at least min_cv, which drops steady background
+    patterns that would otherwise correlate by chance. A query is a few
+    matrix-vector products, one per lag in [-max_lag, max_lag]. Lag > 0
+    means the candidate moves `lag` buckets before the anomalous pattern
+    (likely upstream).
+
+    Shifted products are not renormalized, so larger lags score
+    slightly lower than the same fit at lag 0.
+    """
+
+    def __init__(
+        self,
+        store: PatternStoreV2,
+        max_lag: int = 2,
+        min_events: int = 5,
+        min_cv: float = 0.5,
+    ):
+        self.store = store
+        self.max_lag = max_lag
+        self.min_events = min_events
+        self.min_cv = min_cv
+
+        self._keys: List[PatternKey] = []
+        self._rows: Dict[PatternKey, int] = {}
+        self._z: Optional[np.ndarray] = None
+        self._active: Optional[np.ndarray] = None
+        self._services: Optional[np.ndarray] = None
+
+    def refresh(self):
+        keys, _, matrix = bucket_matrix(self.store, since=self.store.window_start())
+
+        x = matrix.astype(np.float64)
+        totals = x.sum(axis=1)
+        if x.shape[1]:
+            x -= x.mean(axis=1, keepdims=True)
+        norms = np.sqrt(np.einsum("ij,ij->i", x, x))
+
+        # std / mean per row; norms is sqrt(n) * std
+        n = max(x.shape[1], 1)
+        cv = np.divide(
+            norms / np.sqrt(n),
+            totals / n,
+            out=np.zeros_like(norms),
+            where=totals > 0,
+        )
+
+        # Any pattern can be queried; only active ones are candidates
+        self._keys = keys
+        self._rows = {k: i for i, k in enumerate(keys)}
+        self._z = np.divide(x, norms[:, None], out=np.zeros_like(x), where=norms[:, None] > 0)
+        self._active = np.flatnonzero(
+            (totals >= self.min_events) & (norms > 0) & (cv >= self.min_cv)
+        )
+
+        service_ids: Dict[str, int] = {}
+        self._services = np.fromiter(
+            (service_ids.setdefault(k[0], len(service_ids)) for k in keys),
+            dtype=np.int64,
+            count=len(keys),
+        )
+
+    def top(self, key: PatternKey, k: int = 10) -> List[Tuple[PatternKey, float, int]]:
+        """
+        Up to k patterns from other services most correlated with key,
+        as (pattern, correlation, lag_buckets), best first.
+        """
+        if self._z is None:
+            self.refresh()
+
+        row = self._rows.get(key)
+        if row is None or k <= 0:
+            return []
+
+        candidates = self._active[
+            self._services[self._active] != self._services[row]
+        ]
+        if not len(candidates):
+            return []
+
+        z = self._z[candidates]
+        target = self._z[row]
+        n = z.shape[1]
+
+        best = np.full(len(candidates), -np.inf)
+        best_lag = np.zeros(len(candidates), dtype=np.int64)
+
+        for lag in range(-self.max_lag, self.max_lag + 1):
+            if abs(lag) >= n:
+                continue
+            if lag >= 0:
+                corr = z[:, : n - lag] @ target[lag:]
+            else:
+                corr = z[:, -lag:] @ target[: n + lag]
+            better = corr > best
+            best[better] = corr[better]
+            best_lag[better] = lag
+
+        k = min(k, len(candidates))
+        picked = np.argpartition(-best, k - 1)[:k]
+        picked = picked[np.argsort(-best[picked], kind="stable")]
+
+        return [
+            (self._keys[candidates[i]], float(best[i]), int(best_lag[i]))
+            for i in picked
+            if best[i] > 0
+        ]
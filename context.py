@@ -1,10 +1,11 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from datetime import timezone
 from typing import Dict, List, Tuple, Optional
 
+from correlation import RequestIndex
 from detector import AnomalyV2
-from store import PatternStoreV2, PatternKey
+from store import Exemplar, PatternStoreV2, PatternKey
 
 
 @dataclass(frozen=True)
@@ -26,20 +27,45 @@ class AnomalyContextV2:
     deploy_event: Optional[DeployEvent]
     request_ids: List[str]
 
+    # Sampled raw lines of the anomalous pattern, oldest first
+    exemplars: List[Exemplar] = field(default_factory=list)
+
+    # Patterns in any service sharing request IDs with the anomaly,
+    # pattern -> number of shared IDs
+    correlated_patterns: Dict[PatternKey, int] = field(default_factory=dict)
+
+    # Patterns in other services whose bucket series move with the
+    # anomaly, pattern -> (correlation, lag in buckets; > 0 = leads)
+    co_moving_patterns: Dict[PatternKey, Tuple[float, int]] = field(default_factory=dict)
+
+    # Other anomalies grouped into the same incident (see incidents.py)
+    incident_anomalies: List[AnomalyV2] = field(default_factory=list)
+
 
 class ContextBuilderV2:
     def __init__(
         self,
         store: PatternStoreV2,
         context_window: timedelta = timedelta(minutes=5),
+        request_index: Optional[RequestIndex] = None,
+        max_request_ids: int = 10,
+        max_correlated: int = 10,
+        series_correlator=None,
     ):
         self.store = store
         self.context_window = context_window
+        self.request_index = request_index
+        self.max_request_ids = max_request_ids
+        self.max_correlated = max_correlated
+
+        # Optional comovement.SeriesCorrelator (needs NumPy)
+        self.series_correlator = series_correlator
 
     def build(
         self,
         anomaly: AnomalyV2,
         deploy_events: List[DeployEvent] | None = None,
+        incident_anomalies: List[AnomalyV2] | None = None,
     ) -> AnomalyContextV2:
         window_end = anomaly.last_seen
         window_start = window_end - self.context_window
@@ -69,9 +95,30 @@ class ContextBuilderV2:
             window_end,
         )
 
-        # ---- Request IDs (best-effort, placeholder) ----
-        # NOTE: real request correlation comes later
-        request_ids: List[str] = []
+        # ---- Exemplars and request correlation ----
+        exemplars = self.store.get_exemplars(anomaly.key)
+        request_ids = [e.request_id for e in exemplars if e.request_id]
+
+        correlated: Dict[PatternKey, int] = {}
+        if self.request_index is not None:
+            request_ids += self.request_index.request_ids(
+                anomaly.key,
+                limit=self.max_request_ids,
+            )
+            correlated = dict(self.request_index.related(
+                anomaly.key,
+                limit=self.max_correlated,
+            ))
+
+        request_ids = list(dict.fromkeys(request_ids))[: self.max_request_ids]
+
+        co_moving: Dict[PatternKey, Tuple[float, int]] = {}
+        if self.series_correlator is not None:
+            for key, corr, lag in self.series_correlator.top(
+                anomaly.key,
+                k=self.max_correlated,
+            ):
+                co_moving[key] = (corr, lag)
 
         return AnomalyContextV2(
             anomaly=anomaly,
@@ -81,6 +128,10 @@ class ContextBuilderV2:
             level_breakdown=level_breakdown,
             deploy_event=deploy_event,
             request_ids=request_ids,
+            exemplars=exemplars,
+            correlated_patterns=correlated,
+            co_moving_patterns=co_moving,
+            incident_anomalies=list(incident_anomalies or []),
         )
 
     def _find_deploy(
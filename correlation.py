@@ -0,0 +1,139 @@
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from store import PatternKey
+from v3.types import LogEvent
+
+
+# Rough CPython sizes for the footprint estimate
+ID_BYTES = 360        # OrderedDict entry, id string, [last_seen, keys] list, set
+KEY_REF_BYTES = 80    # set slot / deque slot
+
+
+class RequestIndex:
+    """
+    Request (or trace) ID -> pattern keys it touched, across services.
+
+    IDs are kept in last-touched order and dropped once they have been
+    idle for longer than `window` (event time) or when more than
+    `max_ids` are tracked. Each pattern also remembers its most recent
+    `ids_per_key` IDs, which is what related() walks, so a lookup costs
+    at most ids_per_key * keys_per_id set operations. A pattern is
+    forgotten once all of its IDs have expired.
+    """
+
+    def __init__(
+        self,
+        window: timedelta,
+        max_ids: int = 200_000,
+        keys_per_id: int = 32,
+        ids_per_key: int = 256,
+    ):
+        self.window = window
+        self.max_ids = max_ids
+        self.keys_per_id = keys_per_id
+        self.ids_per_key = ids_per_key
+
+        # id -> [last_seen, keys], least recently touched first
+        self._ids: OrderedDict[str, list] = OrderedDict()
+        self._by_key: Dict[PatternKey, Deque[str]] = {}
+        self._max_seen: Optional[datetime] = None
+        self.evicted = 0
+
+    def add(self, event: LogEvent):
+        rid = event.request_id or event.trace_id
+        if not rid:
+            return
+
+        ts = event.timestamp
+        if self._max_seen is None or ts > self._max_seen:
+            self._max_seen = ts
+
+        key: PatternKey = (event.service, event.level, event.template)
+
+        entry = self._ids.get(rid)
+        if entry is None:
+            self._ids[rid] = [ts, {key}]
+        else:
+            self._ids.move_to_end(rid)
+            if ts > entry[0]:
+                entry[0] = ts
+            keys: Set[PatternKey] = entry[1]
+            if key not in keys:
+                if len(keys) >= self.keys_per_id:
+                    # Only keys listed on the ID reference it, so eviction
+                    # knows every deque to clean
+                    self._evict()
+                    return
+                keys.add(key)
+
+        recent = self._by_key.get(key)
+        if recent is None:
+            recent = self._by_key[key] = deque(maxlen=self.ids_per_key)
+        if not recent or recent[-1] != rid:
+            recent.append(rid)
+
+        self._evict()
+
+    def _evict(self):
+        cutoff = self._max_seen - self.window
+        ids = self._ids
+        while ids:
+            rid, (last_seen, keys) = next(iter(ids.items()))
+            if len(ids) <= self.max_ids and last_seen >= cutoff:
+                break
+            del ids[rid]
+            self.evicted += 1
+
+            # Trim expired IDs off the front of each deque the ID was on;
+            # a key goes once all of its IDs have expired
+            for key in keys:
+                recent = self._by_key.get(key)
+                if recent is None:
+                    continue
+                while recent and recent[0] not in ids:
+                    recent.popleft()
+                if not recent:
+                    del self._by_key[key]
+
+    # ---------- Queries ----------
+
+    def request_ids(self, key: PatternKey, limit: Optional[int] = None) -> List[str]:
+        """
+        Live request IDs recently seen on key, newest first.
+        """
+        out = []
+        for rid in reversed(self._by_key.get(key, ())):
+            if rid in self._ids:
+                out.append(rid)
+                if limit is not None and len(out) >= limit:
+                    break
+        return out
+
+    def related(self, key: PatternKey, limit: Optional[int] = None) -> List[Tuple[PatternKey, int]]:
+        """
+        Other patterns (any service) sharing request IDs with key, as
+        (pattern, shared_ids), most shared first.
+        """
+        shared: Dict[PatternKey, int] = {}
+        ids = self._ids
+
+        for rid in set(self._by_key.get(key, ())):
+            entry = ids.get(rid)
+            if entry is None:
+                continue
+            for other in entry[1]:
+                if other != key:
+                    shared[other] = shared.get(other, 0) + 1
+
+        ranked = sorted(shared.items(), key=lambda kv: (-kv[1], kv[0]))
+        return ranked if limit is None else ranked[:limit]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def estimate_bytes(self) -> int:
+        refs = sum(len(e[1]) for e in self._ids.values())
+        refs += sum(len(d) for d in self._by_key.values())
+        return len(self._ids) * ID_BYTES + refs * KEY_REF_BYTES
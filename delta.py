@@ -0,0 +1,355 @@
+"""
+Mergeable store deltas for multi-node aggregation.
+
+Each agent runs its own PatternStoreV2 (track_changes=True) and
+periodically exports the buckets it touched since the last export. A
+central DeltaAggregator merges deltas from many agents into one store
+and runs detection on the cluster-wide view.
+
+Deltas carry each bucket's *current* count on the agent, not an
+increment. Per (agent, pattern, bucket) the aggregator keeps the
+largest count it has applied and only adds the difference, so merging
+is idempotent (re-delivery changes nothing) and commutative (delivery
+order does not matter).
+
+Patterns are identified by fingerprint. An exporter ships the full
+pattern key only in the first delta that mentions it; later deltas
+carry the fingerprint alone and the aggregator resolves it from the
+keys it has already seen.
+
+Transport is a drop directory: agents write one file per delta
+atomically, the aggregator picks them up.
+
+    python -m delta agent --log-file node-a.log --agent node-a --drop /tmp/deltas
+    python -m delta aggregate --drop /tmp/deltas
+"""
+import argparse
+import hashlib
+import json
+import os
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from store import PatternKey, PatternStoreV2
+
+
+DELTA_VERSION = 2
+DELTA_SUFFIX = ".delta"
+
+
+def fingerprint(key: PatternKey) -> str:
+    """
+    Stable 64-bit pattern fingerprint (hex), identical on every node.
+    """
+    return hashlib.blake2b("\x1f".join(key).encode("utf-8"), digest_size=8).hexdigest()
+
+
+# ---------- Wire format ----------
+
+@dataclass
+class PatternDelta:
+    key: Optional[PatternKey]  # None once the aggregator has been sent it
+    buckets: List[Tuple[int, int]]  # (bucket start epoch, count on agent)
+    first_seen: float
+    last_seen: float
+
+
+@dataclass
+class StoreDelta:
+    agent: str
+    seq: int
+    bucket_seconds: int
+    patterns: Dict[str, PatternDelta]  # fingerprint -> delta
+
+    def encode(self) -> bytes:
+        doc = {
+            "v": DELTA_VERSION,
+            "agent": self.agent,
+            "seq": self.seq,
+            "bucket_seconds": self.bucket_seconds,
+            "patterns": {
+                fp: [
+                    list(p.key) if p.key is not None else None,
+                    p.buckets,
+                    p.first_seen,
+                    p.last_seen,
+                ]
+                for fp, p in self.patterns.items()
+            },
+        }
+        return zlib.compress(json.dumps(doc, separators=(",", ":")).encode("utf-8"))
+
+    @classmethod
+    def decode(cls, data: bytes) -> "StoreDelta":
+        doc = json.loads(zlib.decompress(data))
+        if doc.get("v") != DELTA_VERSION:
+            raise ValueError(f"unsupported delta version: {doc.get('v')}")
+
+        return cls(
+            agent=doc["agent"],
+            seq=doc["seq"],
+            bucket_seconds=doc["bucket_seconds"],
+            patterns={
+                fp: PatternDelta(
+                    key=tuple(key) if key is not None else None,
+                    buckets=[(epoch, count) for epoch, count in buckets],
+                    first_seen=first_seen,
+                    last_seen=last_seen,
+                )
+                for fp, (key, buckets, first_seen, last_seen) in doc["patterns"].items()
+            },
+        )
+
+
+# ---------- Agent side ----------
+
+class DeltaExporter:
+    """
+    Turns a change-tracking store into a sequence of deltas.
+
+    Every delta must reach the aggregator, in order: a pattern's key is
+    only sent with the first delta that contains it.
+    """
+
+    def __init__(self, store: PatternStoreV2, agent: str):
+        self.store = store
+        self.agent = agent
+        self.seq = 0
+
+        # pattern -> fingerprint, for every key already shipped
+        self._sent: Dict[PatternKey, str] = {}
+
+    def export(self) -> StoreDelta:
+        patterns: Dict[str, PatternDelta] = {}
+
+        for key, buckets in self.store.drain_changes().items():
+            stats = self.store.get_stats(key)
+            fp = self._sent.get(key)
+            if fp is None:
+                fp = self._sent[key] = fingerprint(key)
+                wire_key = key
+            else:
+                wire_key = None
+            patterns[fp] = PatternDelta(
+                key=wire_key,
+                buckets=[(int(ts.timestamp()), count) for ts, count in buckets],
+                first_seen=stats.first_seen.timestamp(),
+                last_seen=stats.last_seen.timestamp(),
+            )
+
+        self.seq += 1
+        return StoreDelta(
+            agent=self.agent,
+            seq=self.seq,
+            bucket_seconds=int(self.store.bucket_size.total_seconds()),
+            patterns=patterns,
+        )
+
+    def export_to(self, directory: str) -> str:
+        """
+        Write the next delta into a drop directory. The file appears
+        atomically, so a concurrent aggregator never reads a partial one.
+        """
+        delta = self.export()
+        path = os.path.join(directory, f"{delta.agent}-{delta.seq:08d}{DELTA_SUFFIX}")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(delta.encode())
+        os.replace(tmp, path)
+        return path
+
+
+# ---------- Aggregator side ----------
+
+class DeltaAggregator:
+    """
+    Merges agent deltas into one PatternStoreV2.
+
+    Buckets older than the aggregator's window are ignored (and their
+    bookkeeping pruned), so a late or replayed delta cannot re-add
+    counts that have already aged out.
+
+    If an agent loses a pattern (eviction, restart) its counts restart
+    from zero; the aggregator keeps the larger count it already applied,
+    so such buckets are undercounted rather than double counted. Give a
+    restarted agent a new id to avoid this.
+
+    Pattern keys are remembered by fingerprint for the aggregator's
+    lifetime. A fingerprint that arrives without a key the aggregator
+    has seen (e.g. after an aggregator restart) is skipped and counted
+    in unknown; restart the agents as well so they resend their keys.
+    """
+
+    def __init__(self, store: PatternStoreV2):
+        self.store = store
+        self._bucket_seconds = int(store.bucket_size.total_seconds())
+
+        # bucket epoch -> (agent, fingerprint) -> count already applied
+        self._applied: Dict[int, Dict[Tuple[str, str], int]] = {}
+        # fingerprint -> pattern key, from the first delta that sent it
+        self._keys: Dict[str, PatternKey] = {}
+        self.merged = 0
+        self.unknown = 0
+
+    def _cutoff(self) -> float:
+        watermark = self.store.watermark()
+        if watermark is None:
+            return float("-inf")
+        return (watermark - self.store.window_size).timestamp()
+
+    def merge(self, delta: StoreDelta) -> int:
+        """
+        Apply one delta. Returns how many buckets changed.
+        """
+        if delta.bucket_seconds != self._bucket_seconds:
+            raise ValueError(
+                f"delta from {delta.agent} uses {delta.bucket_seconds}s buckets, "
+                f"aggregator uses {self._bucket_seconds}s"
+            )
+
+        cutoff = self._cutoff()
+        changed = 0
+
+        for fp, pattern in delta.patterns.items():
+            if pattern.key is not None:
+                key = self._keys.setdefault(fp, pattern.key)
+            else:
+                key = self._keys.get(fp)
+                if key is None:
+                    self.unknown += 1
+                    continue
+            slot = (delta.agent, fp)
+            increments = []
+
+            for epoch, count in pattern.buckets:
+                if epoch < cutoff:
+                    continue
+                applied = self._applied.get(epoch)
+                if applied is None:
+                    applied = self._applied[epoch] = {}
+                previous = applied.get(slot, 0)
+                if count > previous:
+                    applied[slot] = count
+                    increments.append(
+                        (datetime.fromtimestamp(epoch, tz=timezone.utc), count - previous)
+                    )
+
+            if increments:
+                changed += len(increments)
+                self.store.merge_counts(
+                    key,
+                    increments,
+                    first_seen=datetime.fromtimestamp(pattern.first_seen, tz=timezone.utc),
+                    last_seen=datetime.fromtimestamp(pattern.last_seen, tz=timezone.utc),
+                )
+
+        self.merged += 1
+        self._prune()
+        return changed
+
+    def _prune(self):
+        cutoff = self._cutoff()
+        for epoch in [e for e in self._applied if e < cutoff]:
+            del self._applied[epoch]
+
+    def merge_dir(self, directory: str, remove: bool = True) -> int:
+        """
+        Merge every complete delta file in a drop directory (oldest
+        name first). Returns the number of files merged.
+        """
+        names = sorted(
+            n for n in os.listdir(directory) if n.endswith(DELTA_SUFFIX)
+        )
+        for name in names:
+            path = os.path.join(directory, name)
+            with open(path, "rb") as f:
+                self.merge(StoreDelta.decode(f.read()))
+            if remove:
+                os.remove(path)
+        return len(names)
+
+
+# ---------- CLI ----------
+
+def _store(args, track_changes: bool = False) -> PatternStoreV2:
+    return PatternStoreV2(
+        window_size=timedelta(minutes=args.window_minutes),
+        bucket_size=timedelta(minutes=1),
+        track_changes=track_changes,
+    )
+
+
+def run_agent(args):
+    from v3.ingest import ingest_line
+
+    store = _store(args, track_changes=True)
+    exporter = DeltaExporter(store, args.agent)
+    os.makedirs(args.drop, exist_ok=True)
+
+    pending = 0
+    with open(args.log_file) as f:
+        for line in f:
+            event = ingest_line(line)
+            if event and store.add(event):
+                pending += 1
+            if pending >= args.export_every:
+                exporter.export_to(args.drop)
+                pending = 0
+
+    exporter.export_to(args.drop)
+    print(f"{args.agent}: wrote {exporter.seq} deltas, {store.pattern_count()} patterns")
+
+
+def run_aggregate(args):
+    from detector import AnomalyDetectorV2
+    from severity import severity_label
+
+    store = _store(args)
+    aggregator = DeltaAggregator(store)
+    files = aggregator.merge_dir(args.drop, remove=not args.keep)
+
+    detector = AnomalyDetectorV2(
+        store=store,
+        recent_window=timedelta(minutes=args.recent_minutes),
+        min_baseline=args.min_baseline,
+    )
+    anomalies, _ = detector.detect(datetime.now(timezone.utc))
+
+    print(f"Merged {files} deltas, {store.pattern_count()} patterns")
+    if aggregator.unknown:
+        print(f"  skipped {aggregator.unknown} patterns with unknown fingerprints")
+    for a in anomalies:
+        svc, level, template = a.key
+        print(f"  {severity_label(a.severity).value:<8} {a.reason:<11} {svc} {level} {template}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="StackOracle delta agent / aggregator")
+    parser.add_argument("--window-minutes", type=int, default=10)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    agent = sub.add_parser("agent", help="Ingest a log file and write deltas")
+    agent.add_argument("--log-file", required=True)
+    agent.add_argument("--agent", required=True, help="Unique id of this node")
+    agent.add_argument("--drop", required=True, help="Drop directory")
+    agent.add_argument("--export-every", type=int, default=10000,
+                       help="Write a delta after this many accepted events")
+
+    aggregate = sub.add_parser("aggregate", help="Merge deltas and detect")
+    aggregate.add_argument("--drop", required=True, help="Drop directory")
+    aggregate.add_argument("--recent-minutes", type=int, default=2)
+    aggregate.add_argument("--min-baseline", type=float, default=1.0)
+    aggregate.add_argument("--keep", action="store_true",
+                           help="Leave delta files in place after merging")
+
+    args = parser.parse_args(argv)
+    if args.command == "agent":
+        run_agent(args)
+    else:
+        run_aggregate(args)
+
+
+if __name__ == "__main__":
+    main()
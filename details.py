@@ -1,5 +1,9 @@
-from dataclasses import dataclass
-from typing import Protocol
+import heapq
+import queue
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Iterator, List, Optional, Protocol, Sequence, Tuple
 
 from context import AnomalyContextV2
 
@@ -13,6 +17,10 @@ class ExplanationV2:
     where_to_look: str
     confidence: float
 
+    # Estimated (see estimate_tokens); 0 for local explanations
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+
 
 # ---------- LLM Interface ----------
 
@@ -21,16 +29,111 @@ class LLMClient(Protocol):
         ...
 
 
+# ---------- Prompt ----------
+
+CHARS_PER_TOKEN = 4
+SAMPLE_CHARS = 300
+
+# Identical for every call, so a provider-side prompt cache can reuse it
+PROMPT_PREFIX = """You are a senior production engineer assisting during an active incident.
+
+You MUST follow the rules exactly.
+
+Rules:
+- Do NOT mention security issues unless explicitly stated in the logs
+- Do NOT use words like "breach", "attack", or "unauthorized"
+- Do NOT propose fixes
+- Do NOT speculate beyond the facts
+- Do NOT claim causation
+- Explain impact and investigation direction only
+
+Return output in EXACTLY this format:
+
+SUMMARY:
+<1 short paragraph>
+
+WHY IT MATTERS:
+<1 short paragraph>
+
+WHERE TO LOOK:
+- <bullet>
+- <bullet>
+
+CONFIDENCE:
+<number between 0 and 1>
+
+The incident data follows. Tables are pipe-separated with a header
+row; the pattern is always the last column.
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (about four characters per token for English and
+    log text); good enough for budgeting without a tokenizer.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _table(title: str, header: str, rows: List[str], budget: int) -> Tuple[str, int]:
+    """
+    Render as many rows as fit in budget tokens. Returns the text and
+    the tokens it used; empty if not even the title and header fit.
+    """
+    lines = [f"{title}:", header]
+    used = estimate_tokens(f"{title}:\n{header}\n")
+    if used > budget:
+        return "", 0
+
+    shown = 0
+    for row in rows:
+        cost = estimate_tokens(row + "\n")
+        if used + cost > budget:
+            break
+        lines.append(row)
+        used += cost
+        shown += 1
+
+    if shown < len(rows):
+        note = f"(+{len(rows) - shown} more rows omitted)"
+        lines.append(note)
+        used += estimate_tokens(note + "\n")
+
+    return "\n".join(lines) + "\n", used
+
+
 # ---------- Explainer ----------
 
 class ExplainerV2:
-    def __init__(self, llm: LLMClient):
+    """
+    Builds a prompt of at most about token_budget tokens (the fixed
+    prefix and the anomaly's own facts are always included) and parses
+    the reply. Tables are filled in priority order: incident anomalies,
+    sample lines, co-moving patterns, request-correlated patterns, and
+    the max_related busiest patterns of the same service; the others keep
+    at most max_rows rows.
+    """
+
+    def __init__(
+        self,
+        llm: LLMClient,
+        token_budget: int = 1500,
+        max_related: int = 20,
+        max_rows: int = 10,
+    ):
         self.llm = llm
+        self.token_budget = token_budget
+        self.max_related = max_related
+        self.max_rows = max_rows
 
     def explain(self, ctx: AnomalyContextV2) -> ExplanationV2:
         prompt = self._build_prompt(ctx)
         raw = self.llm.complete(prompt)
-        return self._parse_response(raw)
+        return replace(
+            self._parse_response(raw),
+            prompt_tokens=estimate_tokens(prompt),
+            response_tokens=estimate_tokens(raw),
+        )
 
     # ---------- Prompt ----------
 
@@ -39,16 +142,27 @@ class ExplainerV2:
         svc, level, template = a.key
 
         deploy_info = (
-            f"Yes – version {ctx.deploy_event.version} at {ctx.deploy_event.timestamp}"
+            f"version {ctx.deploy_event.version} at {ctx.deploy_event.timestamp}"
             if ctx.deploy_event
-            else "No deploy detected in this window"
+            else "none in this window"
         )
 
-        return f"""
-You are a senior production engineer assisting during an active incident.
+        if a.reason == "latency_shift":
+            measures = (
+                f"- Recent p99 value: {a.recent_weighted:.0f}ms\n"
+                f"- Baseline p99 value: {a.baseline_weighted:.0f}ms"
+            )
+        else:
+            measures = (
+                f"- Recent weighted count: {a.recent_weighted:.2f}\n"
+                f"- Baseline weighted avg: {a.baseline_weighted:.2f}"
+            )
 
-You MUST follow the rules exactly.
+        levels = " ".join(
+            f"{name}={count}" for name, count in sorted(ctx.level_breakdown.items())
+        ) or "(none)"
 
+        facts = f"""
 Facts:
 - Service: {svc}
 - Log level: {level}
@@ -57,45 +171,55 @@ Facts:
 - Severity score: {a.severity:.2f}
 - First seen: {a.first_seen}
 - Last seen: {a.last_seen}
-- Recent weighted count: {a.recent_weighted}
-- Baseline weighted avg: {a.baseline_weighted}
-
-Context window:
-- From: {ctx.window_start}
-- To: {ctx.window_end}
-
-Level breakdown in window:
-{ctx.level_breakdown}
-
-Related patterns (same service):
-{ctx.related_patterns}
-
-Deploy correlation:
-{deploy_info}
-
-Rules:
-- Do NOT mention security issues unless explicitly stated in the logs
-- Do NOT use words like "breach", "attack", or "unauthorized"
-- Do NOT propose fixes
-- Do NOT speculate beyond the facts
-- Do NOT claim causation
-- Explain impact and investigation direction only
-
-Return output in EXACTLY this format:
+{measures}
+- Context window: {ctx.window_start} to {ctx.window_end}
+- Events by level in window: {levels}
+- Deploy: {deploy_info}
+- Request IDs on this pattern: {", ".join(ctx.request_ids[:5]) or "(none)"}
 
-SUMMARY:
-<1 short paragraph>
-
-WHY IT MATTERS:
-<1 short paragraph>
+"""
+        budget = self.token_budget - estimate_tokens(PROMPT_PREFIX + facts)
+        k = self.max_rows
+
+        # Highest count first; the key breaks ties so the order is stable
+        busiest = heapq.nlargest(
+            self.max_related,
+            ctx.related_patterns.items(),
+            key=lambda kv: (kv[1], kv[0]),
+        )
 
-WHERE TO LOOK:
-- <bullet>
-- <bullet>
+        tables = [
+            ("Other anomalies in this incident", "severity|reason|service|level|pattern", [
+                f"{o.severity:.1f}|{o.reason}|{o.key[0]}|{o.key[1]}|{o.key[2]}"
+                for o in ctx.incident_anomalies[:k]
+            ]),
+            ("Sample lines of this pattern", "line", [
+                e.line[:SAMPLE_CHARS] for e in ctx.exemplars[-k:]
+            ]),
+            ("Other services moving with it (lag > 0 = moved first)",
+             "corr|lag|service|level|pattern", [
+                f"{corr:.2f}|{lag:+d}|{p[0]}|{p[1]}|{p[2]}"
+                for p, (corr, lag) in list(ctx.co_moving_patterns.items())[:k]
+            ]),
+            ("Patterns sharing request IDs", "shared|service|level|pattern", [
+                f"{shared}|{p[0]}|{p[1]}|{p[2]}"
+                for p, shared in list(ctx.correlated_patterns.items())[:k]
+            ]),
+            (f"Busiest other patterns in {svc}", "count|level|pattern", [
+                f"{count}|{p[1]}|{p[2]}" for p, count in busiest
+            ]),
+        ]
+
+        parts = [PROMPT_PREFIX, facts]
+        for title, header, rows in tables:
+            if not rows:
+                continue
+            text, used = _table(title, header, rows, budget)
+            if text:
+                parts.append(text + "\n")
+                budget -= used
 
-CONFIDENCE:
-<number between 0 and 1>
-"""
+        return "".join(parts).rstrip() + "\n"
 
     # ---------- Parsing ----------
 
@@ -129,3 +253,134 @@ CONFIDENCE:
             raise ValueError(
                 f"Malformed LLM response:\n{text}"
             ) from e
+
+
+# ---------- Local fallback ----------
+
+def local_explanation(ctx: AnomalyContextV2) -> ExplanationV2:
+    """
+    Explanation assembled from the context alone, used when the LLM
+    fails or misses its deadline. Confidence is 0: nothing was inferred.
+    """
+    a = ctx.anomaly
+    svc, level, template = a.key
+
+    summary = f'{level} pattern "{template}" in {svc} was flagged as {a.reason}.'
+    if ctx.incident_anomalies:
+        services = sorted({o.key[0] for o in ctx.incident_anomalies} - {svc})
+        summary += f" {len(ctx.incident_anomalies)} related anomalies were grouped with it"
+        summary += f" (also in {', '.join(services)})." if services else "."
+
+    if a.reason == "latency_shift":
+        why = (f"p99 latency moved to {a.recent_weighted:.0f}ms from a baseline "
+               f"of {a.baseline_weighted:.0f}ms")
+    elif a.reason == "new_pattern":
+        why = (f"It is a new pattern: {a.recent_weighted:.1f} weighted events in "
+               f"the recent window and none in the baseline")
+    else:
+        why = (f"It spiked to {a.recent_weighted / a.baseline_weighted:.1f}x its "
+               f"baseline: {a.recent_weighted:.1f} weighted events in the recent "
+               f"window against a baseline of {a.baseline_weighted:.1f} per bucket")
+    why += f" (severity {a.severity:.2f}, seen {a.first_seen} to {a.last_seen})."
+
+    # Both maps are ordered best first
+    if ctx.co_moving_patterns:
+        k, (corr, lag) = next(iter(ctx.co_moving_patterns.items()))
+        why += f' It moves with {k[1]} "{k[2]}" in {k[0]} (correlation {corr:.2f}'
+        if lag:
+            buckets = "bucket" if abs(lag) == 1 else "buckets"
+            why += f", {abs(lag)} {buckets} {'earlier' if lag > 0 else 'later'}"
+        why += ")."
+    if ctx.correlated_patterns:
+        k, shared = next(iter(ctx.correlated_patterns.items()))
+        why += f' It shares {shared} request IDs with {k[1]} "{k[2]}" in {k[0]}.'
+    if ctx.deploy_event:
+        why += (f" {ctx.deploy_event.service} {ctx.deploy_event.version} was "
+                f"deployed at {ctx.deploy_event.timestamp}.")
+
+    where = []
+    if ctx.deploy_event:
+        where.append(f"- Changes in {ctx.deploy_event.service} {ctx.deploy_event.version}")
+    for k in list(ctx.co_moving_patterns)[:1] + list(ctx.correlated_patterns)[:1]:
+        where.append(f"- {k[0]} {k[1]} {k[2]}")
+    busiest = sorted(ctx.related_patterns.items(), key=lambda kv: -kv[1])[:2]
+    for k, count in busiest:
+        where.append(f"- {k[1]} {k[2]} ({count} events, same service)")
+    if ctx.request_ids:
+        where.append(f"- Request {ctx.request_ids[0]}")
+    if not where:
+        where.append(f"- {svc} logs from {ctx.window_start} to {ctx.window_end}")
+
+    return ExplanationV2(
+        summary=summary,
+        why_it_matters=why,
+        where_to_look="\n".join(where),
+        confidence=0.0,
+    )
+
+
+# ---------- Deadline ----------
+
+def explain_within(
+    explainer: ExplainerV2,
+    contexts: Sequence[AnomalyContextV2],
+    deadline: Optional[float] = None,
+    workers: int = 4,
+) -> Iterator[Tuple[int, ExplanationV2, Optional[str]]]:
+    """
+    Explain contexts on up to `workers` threads, most severe first,
+    yielding (index, explanation, fallback_reason) in completion order.
+    fallback_reason is None for an LLM explanation; a failed call or
+    any context still pending `deadline` seconds after the call gets
+    local_explanation() instead, so the generator always yields every
+    index and never runs past the deadline. Worker threads are daemons,
+    so an abandoned call cannot hold up process exit.
+    """
+    # Most severe first, so rate limits and cost caps hit the least severe
+    jobs: "queue.PriorityQueue[Tuple[float, int]]" = queue.PriorityQueue()
+    results: "queue.Queue[tuple]" = queue.Queue()
+    for i, ctx in enumerate(contexts):
+        jobs.put((-ctx.anomaly.severity, i))
+
+    def work():
+        while True:
+            try:
+                _, i = jobs.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results.put((i, explainer.explain(contexts[i]), None))
+            except Exception as e:
+                results.put((i, None, e))
+
+    for _ in range(min(workers, len(contexts))):
+        threading.Thread(target=work, daemon=True).start()
+
+    end = None if deadline is None else time.monotonic() + deadline
+    pending = set(range(len(contexts)))
+
+    while pending:
+        timeout = None if end is None else end - time.monotonic()
+        if timeout is not None and timeout <= 0:
+            break
+        try:
+            i, explanation, error = results.get(timeout=timeout)
+        except queue.Empty:
+            break
+
+        pending.discard(i)
+        if error is None:
+            yield i, explanation, None
+        else:
+            reason = (str(error).splitlines() or [type(error).__name__])[0]
+            yield i, local_explanation(contexts[i]), f"LLM error: {reason[:200]}"
+
+    # Deadline passed: drop calls that have not started
+    while True:
+        try:
+            jobs.get_nowait()
+        except queue.Empty:
+            break
+
+    for i in sorted(pending):
+        yield i, local_explanation(contexts[i]), "deadline passed"
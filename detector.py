@@ -1,15 +1,28 @@
+import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from datetime import timezone
 from typing import List, Optional
 
+from metrics import REGISTRY
 from store import PatternStoreV2, PatternKey
 
 
+DETECTION_SECONDS = REGISTRY.histogram(
+    "stackoracle_detection_seconds",
+    "Duration of one detection pass over all patterns",
+)
+ANOMALIES = REGISTRY.counter(
+    "stackoracle_anomalies_total",
+    "Anomalies flagged by detection passes, by reason",
+    ["reason"],
+)
+
+
 @dataclass(frozen=True)
 class AnomalyV2:
     key: PatternKey
-    reason: str  # spike | new_pattern
+    reason: str  # spike | new_pattern | latency_shift
     severity: float
     recent_weighted: float
     baseline_weighted: float
@@ -25,6 +38,9 @@ class NearMiss:
     threshold: float
 
 
+BASELINE_MODES = ("window", "long", "hour_of_day")
+
+
 class AnomalyDetectorV2:
     def __init__(
         self,
@@ -33,25 +49,67 @@ class AnomalyDetectorV2:
         spike_multiplier: float = 5.0,
         min_baseline: float = 5.0,
         track_near_miss: bool = True,
+        baseline: str = "window",
+        latency_multiplier: Optional[float] = None,
+        latency_quantile: float = 0.99,
+        min_latency_samples: int = 20,
     ):
+        if baseline not in BASELINE_MODES:
+            raise ValueError(f"unknown baseline mode: {baseline}")
+
         self.store = store
         self.recent_window = recent_window
         self.spike_multiplier = spike_multiplier
         self.min_baseline = min_baseline
         self.track_near_miss = track_near_miss
 
+        # window      : fine buckets in [now - window, now - recent)
+        # long        : all retained history, including rollups
+        # hour_of_day : same hour of day on previous days (rollups)
+        self.baseline = baseline
+
+        # Latency shift: recent quantile of captured values (store needs
+        # track_values) vs. the same quantile before the recent window.
+        # Disabled unless latency_multiplier is set.
+        self.latency_multiplier = latency_multiplier
+        self.latency_quantile = latency_quantile
+        self.min_latency_samples = min_latency_samples
+
     def detect(
         self,
         now: datetime,
+    ) -> tuple[List[AnomalyV2], List[NearMiss]]:
+        started = time.perf_counter()
+        anomalies, near_misses = self._detect(now)
+
+        if self.latency_multiplier is not None:
+            anomalies = sorted(
+                anomalies + self._detect_latency(now),
+                key=lambda a: a.severity,
+                reverse=True,
+            )
+
+        DETECTION_SECONDS.observe(time.perf_counter() - started)
+
+        for a in anomalies:
+            ANOMALIES.labels(a.reason).inc()
+
+        return anomalies, near_misses
+
+    def _detect(
+        self,
+        now: datetime,
     ) -> tuple[List[AnomalyV2], List[NearMiss]]:
         anomalies: List[AnomalyV2] = []
         near_misses: List[NearMiss] = []
 
         recent_cutoff = now - self.recent_window
+        window_start = now - self.store.window_size
 
         for key in self.store.get_patterns():
             buckets = self.store.get_buckets(key)
-            if not buckets:
+            # Sketch mode: not judged until it has a real exact bucket
+            if not buckets or self.store.is_estimated(key):
                 continue
 
             recent = self.store.get_weighted_count(key, recent_cutoff)
@@ -60,10 +118,15 @@ class AnomalyDetectorV2:
             baseline_total = 0.0
             baseline_buckets = 0
 
-            for ts, count in buckets:
-                if ts < recent_cutoff:
-                    baseline_total += count
-                    baseline_buckets += 1
+            if self.baseline == "window":
+                for ts, count in buckets:
+                    if window_start <= ts < recent_cutoff:
+                        baseline_total += count
+                        baseline_buckets += 1
+            else:
+                baseline_total, baseline_buckets = self._history_baseline(
+                    key, now, recent_cutoff
+                )
 
             baseline_avg = (
                 baseline_total / baseline_buckets
@@ -71,52 +134,130 @@ class AnomalyDetectorV2:
                 else 0.0
             )
 
+            anomaly, near_miss = self.evaluate(key, recent, baseline_avg)
+            if anomaly:
+                anomalies.append(anomaly)
+            elif near_miss:
+                near_misses.append(near_miss)
+
+        anomalies.sort(key=lambda a: a.severity, reverse=True)
+        return anomalies, near_misses
+
+    def evaluate(
+        self,
+        key: PatternKey,
+        recent: float,
+        baseline_avg: float,
+    ) -> tuple[Optional[AnomalyV2], Optional[NearMiss]]:
+        """
+        Apply the detection rules to one pattern's aggregates.
+
+        recent is the weighted count in the recent window; baseline_avg
+        is the raw per-bucket average before it.
+        """
+        # ---- New pattern ----
+
+        level = key[1]
+
+        if level in {"INFO", "DEBUG"}:
+            return None, None
+        if baseline_avg == 0.0 and recent > 0:
             stats = self.store.get_stats(key)
+            return AnomalyV2(
+                key=key,
+                reason="new_pattern",
+                severity=recent,
+                recent_weighted=recent,
+                baseline_weighted=0.0,
+                first_seen=stats.first_seen,
+                last_seen=stats.last_seen,
+            ), None
+
+        # ---- Spike detection ----
+        if baseline_avg >= self.min_baseline:
+            threshold = baseline_avg * self.spike_multiplier
+            if recent >= threshold:
+                stats = self.store.get_stats(key)
+                return AnomalyV2(
+                    key=key,
+                    reason="spike",
+                    severity=recent / baseline_avg,
+                    recent_weighted=recent,
+                    baseline_weighted=baseline_avg,
+                    first_seen=stats.first_seen,
+                    last_seen=stats.last_seen,
+                ), None
+            elif self.track_near_miss and recent >= threshold * 0.7:
+                return None, NearMiss(
+                    key=key,
+                    recent_weighted=recent,
+                    baseline_weighted=baseline_avg,
+                    threshold=threshold,
+                )
+
+        return None, None
 
-            # ---- New pattern ----
-            
-            level = key[1]
+    def _detect_latency(self, now: datetime) -> List[AnomalyV2]:
+        anomalies: List[AnomalyV2] = []
+        recent_cutoff = now - self.recent_window
+        q = self.latency_quantile
 
-            if level in {"INFO", "DEBUG"}:
+        for key in self.store.get_value_patterns():
+            recent = self.store.get_value_sketch(key, since=recent_cutoff)
+            if recent.count < self.min_latency_samples:
                 continue
-            if baseline_avg == 0.0 and recent > 0:
-                anomalies.append(
-                    AnomalyV2(
-                        key=key,
-                        reason="new_pattern",
-                        severity=recent,
-                        recent_weighted=recent,
-                        baseline_weighted=0.0,
-                        first_seen=stats.first_seen,
-                        last_seen=stats.last_seen,
-                    )
-                )
+            baseline = self.store.get_value_sketch(key, until=recent_cutoff)
+            if baseline.count < self.min_latency_samples:
                 continue
 
-            # ---- Spike detection ----
-            if baseline_avg >= self.min_baseline:
-                threshold = baseline_avg * self.spike_multiplier
-                if recent >= threshold:
-                    anomalies.append(
-                        AnomalyV2(
-                            key=key,
-                            reason="spike",
-                            severity=recent / baseline_avg,
-                            recent_weighted=recent,
-                            baseline_weighted=baseline_avg,
-                            first_seen=stats.first_seen,
-                            last_seen=stats.last_seen,
-                        )
-                    )
-                elif self.track_near_miss and recent >= threshold * 0.7:
-                    near_misses.append(
-                        NearMiss(
-                            key=key,
-                            recent_weighted=recent,
-                            baseline_weighted=baseline_avg,
-                            threshold=threshold,
-                        )
-                    )
+            recent_q = recent.quantile(q)
+            baseline_q = baseline.quantile(q)
+            if baseline_q <= 0.0 or recent_q < baseline_q * self.latency_multiplier:
+                continue
 
-        anomalies.sort(key=lambda a: a.severity, reverse=True)
-        return anomalies, near_misses
+            # Scaled so that crossing the threshold scores like a spike
+            # that just crosses spike_multiplier
+            severity = (
+                recent_q / baseline_q
+                / self.latency_multiplier
+                * self.spike_multiplier
+            )
+
+            stats = self.store.get_stats(key)
+            anomalies.append(AnomalyV2(
+                key=key,
+                reason="latency_shift",
+                severity=severity,
+                recent_weighted=recent_q,
+                baseline_weighted=baseline_q,
+                first_seen=stats.first_seen,
+                last_seen=stats.last_seen,
+            ))
+
+        return anomalies
+
+    def _history_baseline(
+        self,
+        key: PatternKey,
+        now: datetime,
+        recent_cutoff: datetime,
+    ) -> tuple[float, int]:
+        """
+        Baseline from rollup history. Counts are divided by the number of
+        fine buckets merged, so the average stays per-bucket.
+        """
+        total = 0.0
+        n_buckets = 0
+
+        same_hour = self.baseline == "hour_of_day"
+        previous_days = now - timedelta(hours=23)
+
+        for ts, count, n in self.store.get_history(key):
+            if ts >= recent_cutoff:
+                break
+            if same_hour and (ts.hour != now.hour or ts >= previous_days):
+                continue
+            total += count
+            n_buckets += n
+
+        return total, n_buckets
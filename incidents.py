@@ -0,0 +1,241 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from context import DeployEvent
+from detector import AnomalyV2
+from store import PatternStoreV2
+
+
+# Patterns with fewer fine buckets are never linked by correlation
+MIN_SERIES_BUCKETS = 4
+
+# Rows scored against their candidates per matrix product
+CORRELATION_BLOCK = 512
+
+
+@dataclass
+class Incident:
+    """
+    Anomalies judged to share a cause. anomalies[0] is the lead (most
+    severe) and is the one that gets a context and an explanation.
+    """
+    anomalies: List[AnomalyV2]
+    deploy_event: Optional[DeployEvent] = None
+    services: List[str] = field(default_factory=list)
+
+    @property
+    def lead(self) -> AnomalyV2:
+        return self.anomalies[0]
+
+    @property
+    def related(self) -> List[AnomalyV2]:
+        return self.anomalies[1:]
+
+
+class _DisjointSet:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # Lower index (more severe) stays the root: deterministic
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def find_deploy(
+    anomaly: AnomalyV2,
+    deploy_events: Sequence[DeployEvent],
+    context_window: timedelta,
+) -> Optional[DeployEvent]:
+    """
+    Same rule as ContextBuilderV2: a deploy of the anomaly's service in
+    the context window ending at its last event.
+    """
+    start = anomaly.last_seen - context_window
+    for d in deploy_events:
+        if d.service == anomaly.key[0] and start <= d.timestamp <= anomaly.last_seen:
+            return d
+    return None
+
+
+def _link_overlapping(
+    idx: Sequence[int],
+    first: Sequence[float],
+    last: Sequence[float],
+    gap: float,
+    groups: _DisjointSet,
+):
+    """
+    Union every run of time ranges in idx that overlap (allowing gap
+    seconds between them): one sweep in first_seen order.
+    """
+    order = sorted(idx, key=lambda i: first[i])
+    head = order[0]
+    reach = last[head]
+    for i in order[1:]:
+        if first[i] <= reach + gap:
+            groups.union(head, i)
+            reach = max(reach, last[i])
+        else:
+            head = i
+            reach = last[i]
+
+
+def _link_correlated(
+    anomalies: Sequence[AnomalyV2],
+    store,
+    first: Sequence[float],
+    last: Sequence[float],
+    gap: float,
+    min_correlation: float,
+    groups: _DisjointSet,
+):
+    """
+    Union cross-service pairs with overlapping time ranges whose bucket
+    series correlate >= min_correlation.
+
+    The score is the Pearson correlation over the union of the two
+    series' buckets (missing buckets count as zero). Buckets are never
+    empty, so every sum it needs comes from matrix products over one
+    pattern x bucket matrix, a block of rows at a time; each block is
+    scored only against the rows that start before its ranges end.
+    """
+    import numpy as np
+
+    # One request per shard when the store is sharded
+    series = store.get_buckets_many(dict.fromkeys(a.key for a in anomalies))
+
+    # A pattern that only just appeared correlates with any spike
+    eligible = sorted(
+        (i for i, a in enumerate(anomalies) if len(series[a.key]) >= MIN_SERIES_BUCKETS),
+        key=lambda i: first[i],
+    )
+    if len(eligible) < 2:
+        return
+
+    col: Dict[datetime, int] = {}
+    for i in eligible:
+        for ts, _ in series[anomalies[i].key]:
+            col.setdefault(ts, len(col))
+
+    x = np.zeros((len(eligible), len(col)), dtype=np.float64)
+    for row, i in enumerate(eligible):
+        for ts, count in series[anomalies[i].key]:
+            x[row, col[ts]] = count
+    present = (x > 0).astype(np.float64)
+
+    sums = x.sum(axis=1)
+    squares = np.einsum("ij,ij->i", x, x)
+    sizes = present.sum(axis=1)
+
+    idx = np.array(eligible, dtype=np.int64)
+    starts = np.array([first[i] for i in eligible], dtype=np.float64)
+    ends = np.array([last[i] for i in eligible], dtype=np.float64)
+    service_ids: Dict[str, int] = {}
+    services = np.array(
+        [service_ids.setdefault(anomalies[i].key[0], len(service_ids)) for i in eligible],
+        dtype=np.int64,
+    )
+
+    for lo in range(0, len(idx), CORRELATION_BLOCK):
+        hi = min(lo + CORRELATION_BLOCK, len(idx))
+        # Later rows start no earlier, so only those starting before the
+        # block's ranges end can overlap it
+        stop = int(np.searchsorted(starts, ends[lo:hi].max() + gap, side="right"))
+        if stop <= lo + 1:
+            continue
+
+        roots = np.array([groups.find(i) for i in idx[lo:stop]], dtype=np.int64)
+        rows, cols = slice(lo, hi), slice(lo, stop)
+
+        candidate = (
+            (np.arange(lo, stop)[None, :] > np.arange(lo, hi)[:, None])
+            & (starts[None, cols] <= ends[rows, None] + gap)
+            & (services[None, cols] != services[rows, None])
+            & (roots[None, :] != roots[: hi - lo, None])
+        )
+        if not candidate.any():
+            continue
+
+        # Sizes of the pairwise bucket unions, then centred sums over them
+        n = sizes[rows, None] + sizes[None, cols] - present[rows] @ present[cols].T
+        sx, sy = sums[rows, None], sums[None, cols]
+        cov = x[rows] @ x[cols].T - sx * sy / n
+        vx = squares[rows, None] - sx * sx / n
+        vy = squares[None, cols] - sy * sy / n
+
+        scored = candidate & (n >= 3) & (vx > 0) & (vy > 0)
+        corr = np.where(scored, cov, 0.0) / np.sqrt(np.where(scored, vx * vy, 1.0))
+
+        for a, b in zip(*np.nonzero(scored & (corr >= min_correlation))):
+            groups.union(int(idx[lo + a]), int(idx[lo + b]))
+
+
+def group_anomalies(
+    anomalies: Sequence[AnomalyV2],
+    store: Optional[PatternStoreV2] = None,
+    deploy_events: Sequence[DeployEvent] = (),
+    context_window: timedelta = timedelta(minutes=5),
+    min_correlation: float = 0.8,
+) -> List[Incident]:
+    """
+    Cluster anomalies into incidents. Two anomalies are linked when
+    their [first_seen, last_seen] ranges overlap or are within
+    context_window of each other, and they
+
+      - are in the same service, or
+      - follow the same deploy, or
+      - (given a store) have bucket series correlating >= min_correlation.
+
+    Links are transitive. The input order (severity, most severe first)
+    is kept inside and across incidents, so grouping is deterministic.
+    Candidate pairs are bucketed by service and deploy and swept in time
+    order, so only the correlation check looks at pairs across groups.
+    """
+    anomalies = list(anomalies)
+    n = len(anomalies)
+    groups = _DisjointSet(n)
+    if not n:
+        return []
+
+    deploys = [find_deploy(a, deploy_events, context_window) for a in anomalies]
+    first = [a.first_seen.timestamp() for a in anomalies]
+    last = [a.last_seen.timestamp() for a in anomalies]
+    gap = context_window.total_seconds()
+
+    by_service: Dict[str, List[int]] = {}
+    by_deploy: Dict[DeployEvent, List[int]] = {}
+    for i, a in enumerate(anomalies):
+        by_service.setdefault(a.key[0], []).append(i)
+        if deploys[i] is not None:
+            by_deploy.setdefault(deploys[i], []).append(i)
+
+    for idx in list(by_service.values()) + list(by_deploy.values()):
+        _link_overlapping(idx, first, last, gap, groups)
+
+    if store is not None and len(by_service) > 1:
+        _link_correlated(anomalies, store, first, last, gap, min_correlation, groups)
+
+    members: Dict[int, List[int]] = {}
+    for i in range(n):
+        members.setdefault(groups.find(i), []).append(i)
+
+    incidents = []
+    for root in sorted(members):
+        idx = members[root]
+        deploy = next((deploys[i] for i in idx if deploys[i] is not None), None)
+        incidents.append(Incident(
+            anomalies=[anomalies[i] for i in idx],
+            deploy_event=deploy,
+            services=list(dict.fromkeys(anomalies[i].key[0] for i in idx)),
+        ))
+
+    return incidents
@@ -1,11 +1,24 @@
 import os
 from dotenv import load_dotenv
 import json
+import time
 import urllib.request
 from typing import Dict
 
+from metrics import REGISTRY
+
 load_dotenv()
 
+LLM_SECONDS = REGISTRY.histogram(
+    "stackoracle_llm_request_seconds",
+    "OpenRouter completion latency",
+)
+LLM_REQUESTS = REGISTRY.counter(
+    "stackoracle_llm_requests_total",
+    "OpenRouter completion requests, by outcome",
+    ["outcome"],
+)
+
 class OpenRouterLLM:
     def __init__(
         self,
@@ -54,14 +67,25 @@ class OpenRouterLLM:
             method="POST",
         )
 
-        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
-            body = json.loads(resp.read().decode("utf-8"))
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                body = json.loads(resp.read().decode("utf-8"))
+        except Exception:
+            LLM_REQUESTS.labels("error").inc()
+            raise
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - started)
 
         try:
-            return body["choices"][0]["message"]["content"]
+            content = body["choices"][0]["message"]["content"]
         except (KeyError, IndexError) as e:
+            LLM_REQUESTS.labels("malformed").inc()
             raise RuntimeError(
                 f"Unexpected OpenRouter response: {body}"
             ) from e
 
+        LLM_REQUESTS.labels("ok").inc()
+        return content
+
 
@@ -0,0 +1,176 @@
+import time
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+import v3.ingest
+
+
+# Latency histogram: bucket i holds calls that took < 2**i microseconds
+HISTOGRAM_BUCKETS = 32
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    histogram: List[int] = field(default_factory=lambda: [0] * HISTOGRAM_BUCKETS)
+
+    def record(self, seconds: float):
+        self.calls += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        idx = int(seconds * 1e6).bit_length()
+        self.histogram[min(idx, HISTOGRAM_BUCKETS - 1)] += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound (seconds) of the histogram bucket holding quantile q.
+        """
+        if not self.calls:
+            return 0.0
+        target = q * self.calls
+        seen = 0
+        for idx, count in enumerate(self.histogram):
+            seen += count
+            if seen >= target:
+                return (1 << idx) / 1e6
+        return self.max
+
+
+class StageProfiler:
+    """
+    Per-stage wall time, call counts and latency histograms.
+
+    Instrumentation works by wrapping functions and bound methods, so
+    nothing is installed (and nothing is paid) unless profiling is on.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, StageStats] = {}
+        self._undo: List[Callable[[], None]] = []
+        self._started = time.perf_counter()
+
+    def stage(self, name: str) -> StageStats:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        return stats
+
+    # ---------- Wrapping ----------
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        stats = self.stage(name)
+        clock = time.perf_counter
+
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            t0 = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stats.record(clock() - t0)
+
+        return timed
+
+    def timed_iter(self, name: str, iterable: Iterable) -> Iterator:
+        """
+        Time how long each next() on iterable takes (e.g. file reads).
+        """
+        stats = self.stage(name)
+        clock = time.perf_counter
+        it = iter(iterable)
+
+        while True:
+            t0 = clock()
+            try:
+                item = next(it)
+            except StopIteration:
+                stats.record(clock() - t0)
+                return
+            stats.record(clock() - t0)
+            yield item
+
+    def patch(self, owner, attr: str, name: str):
+        """
+        Replace owner.attr with a timed wrapper until close().
+        """
+        original = getattr(owner, attr)
+        had_own = attr in vars(owner)
+        setattr(owner, attr, self.wrap(name, original))
+
+        def undo():
+            if had_own:
+                setattr(owner, attr, original)
+            else:
+                delattr(owner, attr)
+
+        self._undo.append(undo)
+
+    def close(self):
+        while self._undo:
+            self._undo.pop()()
+
+    # ---------- Report ----------
+
+    def rows(self) -> List[Tuple[str, StageStats]]:
+        return list(self.stages.items())
+
+    def report(self, out=print):
+        wall = time.perf_counter() - self._started
+
+        out("\nProfile (stages may nest: ingest includes format/parse/normalize)")
+        out(f"  {'stage':<12} {'calls':>9} {'total s':>9} {'% wall':>7} "
+            f"{'mean us':>9} {'p50 us':>8} {'p99 us':>8} {'max us':>9}")
+
+        for name, s in self.rows():
+            if not s.calls:
+                continue
+            out(
+                f"  {name:<12} {s.calls:>9} {s.total:>9.3f} "
+                f"{s.total / wall:>7.1%} {s.total / s.calls * 1e6:>9.1f} "
+                f"{s.quantile(0.5) * 1e6:>8.0f} {s.quantile(0.99) * 1e6:>8.0f} "
+                f"{s.max * 1e6:>9.0f}"
+            )
+
+        out(f"  {'wall':<12} {'':>9} {wall:>9.3f}")
+
+
+def instrument(
+    profiler: StageProfiler,
+    store=None,
+    detector=None,
+    context_builder=None,
+    explainer=None,
+):
+    """
+    Install timing hooks on the ingest pipeline and on the given
+    component instances.
+    """
+    # ingest_line_with_reason resolves these through module globals at call time
+    profiler.patch(v3.ingest, "detect_format", "format")
+    for parser in ("parse_json", "parse_timestamped", "parse_kv"):
+        profiler.patch(v3.ingest, parser, "parse")
+    profiler.patch(v3.ingest, "normalize", "normalize")
+    profiler.patch(v3.ingest, "normalize_with_values", "normalize")
+
+    if store is not None:
+        profiler.patch(store, "add", "store")
+        if hasattr(store, "add_batch"):
+            profiler.patch(store, "add_batch", "store")
+    if detector is not None:
+        profiler.patch(detector, "detect", "detection")
+    if context_builder is not None:
+        profiler.patch(context_builder, "build", "context")
+    if explainer is not None:
+        instrument_explainer(profiler, explainer)
+
+
+def instrument_explainer(profiler: StageProfiler, explainer):
+    """
+    Timing hooks for an explainer created after instrument() ran.
+    """
+    profiler.patch(explainer, "explain", "explain")
+    profiler.patch(explainer.llm, "complete", "llm")
@@ -0,0 +1,204 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from detector import AnomalyDetectorV2, AnomalyV2
+from store import LEVEL_WEIGHTS, PatternKey, PatternStoreV2
+from v3.types import LogEvent
+
+
+@dataclass
+class TimelineEntry:
+    key: PatternKey
+    reason: str
+    fired_at: datetime
+    cleared_at: Optional[datetime]
+    peak_severity: float
+
+
+class ReplayDetector:
+    """
+    Replays a historical stream and evaluates detection at every bucket
+    boundary in event time.
+
+    Instead of rescanning every pattern at each boundary, it keeps
+    per-pattern running aggregates (recent count, baseline total and
+    bucket count) and shifts buckets between them as the recent and
+    window cutoffs advance. Only patterns whose aggregates changed are
+    re-evaluated, using the detector's own rules.
+
+    The baseline is the fine buckets in [now - window, now - recent), so
+    only the detector's "window" baseline mode is supported. Patterns the
+    store evicts (capacity, sketch or idle) are dropped from the replay
+    state as well, and start afresh if they come back.
+    """
+
+    def __init__(self, store: PatternStoreV2, detector: AnomalyDetectorV2):
+        if detector.baseline != "window":
+            raise ValueError(
+                f"replay does not support the {detector.baseline!r} baseline"
+            )
+
+        self.store = store
+        self.detector = detector
+
+        self.bucket_size = store.bucket_size
+        self.window = store.window_size
+        self.recent_window = detector.recent_window
+
+        # bucket_start -> key -> raw count, for buckets still in the window
+        self._by_bucket: Dict[datetime, Dict[PatternKey, int]] = {}
+
+        self._recent: Dict[PatternKey, int] = {}
+        self._base_total: Dict[PatternKey, int] = {}
+        self._base_buckets: Dict[PatternKey, int] = {}
+
+        self._dirty: Set[PatternKey] = set()
+        self._boundary: Optional[datetime] = None
+
+        self._active: Dict[PatternKey, TimelineEntry] = {}
+        self.timeline: List[TimelineEntry] = []
+        self.evaluations = 0
+
+    # ---------- Cutoffs ----------
+
+    def _recent_cutoff(self) -> datetime:
+        return self._boundary - self.recent_window
+
+    def _window_start(self) -> datetime:
+        return self._boundary - self.window
+
+    # ---------- Stream ----------
+
+    def add(self, event: LogEvent):
+        bucket_ts = self.store.bucket_start(event.timestamp)
+
+        # Crossing into a new bucket closes every boundary up to it
+        if self._boundary is None:
+            self._boundary = bucket_ts
+        while bucket_ts > self._boundary:
+            self._advance()
+
+        key: PatternKey = (event.service, event.level, event.template)
+        if key in self._dirty or key in self._recent or key in self._base_total:
+            if not self.store.has_pattern(key):
+                self._forget(key)
+
+        if not self.store.add(event):
+            return
+
+        if bucket_ts < self._window_start():
+            return
+
+        counts = self._by_bucket.setdefault(bucket_ts, {})
+        previous = counts.get(key, 0)
+        counts[key] = previous + 1
+
+        if bucket_ts >= self._recent_cutoff():
+            self._recent[key] = self._recent.get(key, 0) + 1
+        else:
+            self._base_total[key] = self._base_total.get(key, 0) + 1
+            if previous == 0:
+                self._base_buckets[key] = self._base_buckets.get(key, 0) + 1
+
+        self._dirty.add(key)
+
+    def run(self, events: Iterable[LogEvent]) -> List[TimelineEntry]:
+        for event in events:
+            self.add(event)
+        return self.finish()
+
+    def finish(self) -> List[TimelineEntry]:
+        """
+        Evaluate the last open boundary and return the timeline.
+        """
+        if self._boundary is not None:
+            self._advance()
+        return sorted(self.timeline, key=lambda t: (t.fired_at, t.key))
+
+    # ---------- Incremental state ----------
+
+    def _advance(self):
+        old_recent = self._recent_cutoff()
+        old_start = self._window_start()
+        self._boundary += self.bucket_size
+
+        # Buckets leaving the recent window join the baseline
+        ts = old_recent
+        while ts < self._recent_cutoff():
+            for key, count in self._by_bucket.get(ts, {}).items():
+                self._recent[key] -= count
+                self._base_total[key] = self._base_total.get(key, 0) + count
+                self._base_buckets[key] = self._base_buckets.get(key, 0) + 1
+                self._dirty.add(key)
+            ts += self.bucket_size
+
+        # Buckets leaving the window drop out of the baseline
+        ts = old_start
+        while ts < self._window_start():
+            for key, count in self._by_bucket.pop(ts, {}).items():
+                self._base_total[key] -= count
+                self._base_buckets[key] -= 1
+                self._dirty.add(key)
+            ts += self.bucket_size
+
+        self._evaluate(self._boundary)
+
+    def _evaluate(self, now: datetime):
+        for key in self._dirty:
+            if not self.store.has_pattern(key):
+                self._forget(key)
+                continue
+
+            self.evaluations += 1
+
+            recent = self._recent.get(key, 0) * LEVEL_WEIGHTS.get(key[1], 1.0)
+            n = self._base_buckets.get(key, 0)
+            baseline_avg = self._base_total.get(key, 0) / n if n > 0 else 0.0
+
+            anomaly: Optional[AnomalyV2] = None
+            if recent > 0 or n > 0:
+                anomaly, _ = self.detector.evaluate(key, recent, baseline_avg)
+
+            self._transition(key, anomaly, now)
+
+            if not recent and not n:
+                self._recent.pop(key, None)
+                self._base_total.pop(key, None)
+                self._base_buckets.pop(key, None)
+
+        self._dirty.clear()
+
+    def _forget(self, key: PatternKey):
+        """
+        Drop all replay state for a key the store no longer holds.
+        """
+        self._recent.pop(key, None)
+        self._base_total.pop(key, None)
+        self._base_buckets.pop(key, None)
+        for counts in self._by_bucket.values():
+            counts.pop(key, None)
+
+        entry = self._active.pop(key, None)
+        if entry is not None:
+            entry.cleared_at = self._boundary
+
+    def _transition(self, key: PatternKey, anomaly: Optional[AnomalyV2], now: datetime):
+        entry = self._active.get(key)
+
+        if anomaly is not None:
+            if entry is None:
+                entry = TimelineEntry(
+                    key=key,
+                    reason=anomaly.reason,
+                    fired_at=now,
+                    cleared_at=None,
+                    peak_severity=anomaly.severity,
+                )
+                self._active[key] = entry
+                self.timeline.append(entry)
+            elif anomaly.severity > entry.peak_severity:
+                entry.peak_severity = anomaly.severity
+        elif entry is not None:
+            entry.cleared_at = now
+            del self._active[key]
@@ -0,0 +1,174 @@
+"""
+Client-side rate limiting and spend control for LLM calls.
+
+ScheduledLLM sits in front of any LLMClient. Before each call it waits
+for a request slot and for enough tokens (prompt plus the largest
+allowed response) in per-minute token buckets, and it refuses calls that
+would push estimated spend past max_cost or would have to wait past
+the deadline. A refused call raises BudgetExceeded, which
+details.explain_within() turns into a local explanation. Contexts are
+handed to the workers most severe first, so when limits bite it is the
+least severe anomalies that lose their LLM explanation.
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+from details import LLMClient, estimate_tokens
+
+
+class BudgetExceeded(RuntimeError):
+    """
+    Call refused by ScheduledLLM (cost cap or rate-limit wait).
+    """
+
+
+class TokenBucket:
+    """
+    Holds up to `burst` units, refilled continuously at per_minute / 60
+    units per second.
+    """
+
+    def __init__(
+        self,
+        per_minute: float,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else per_minute
+        self.clock = clock
+        self.level = self.capacity
+        self._updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Seconds until amount is available (amounts above capacity are
+        treated as a full bucket).
+        """
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate) if self.rate else float("inf")
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount: float):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class ScheduledLLM:
+    """
+    LLMClient wrapper enforcing requests/min, tokens/min and a per-run
+    cost cap. Costs are per 1000 estimated tokens; a call reserves the
+    cost of max_response_tokens and is charged for what it actually
+    returned. Admission is serialized: concurrent callers wait for the
+    limits one at a time, in roughly the order they arrived.
+    """
+
+    def __init__(
+        self,
+        llm: LLMClient,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_cost: Optional[float] = None,
+        prompt_cost_per_1k: float = 0.0,
+        response_cost_per_1k: float = 0.0,
+        max_response_tokens: int = 400,
+        deadline: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.llm = llm
+        self.max_cost = max_cost
+        self.prompt_cost_per_1k = prompt_cost_per_1k
+        self.response_cost_per_1k = response_cost_per_1k
+        self.max_response_tokens = max_response_tokens
+        # Absolute clock() time after which no call is started
+        self.deadline = deadline
+        self.clock = clock
+        self.sleep = sleep
+
+        self.requests = (
+            TokenBucket(requests_per_minute, clock=clock)
+            if requests_per_minute else None
+        )
+        self.tokens = (
+            TokenBucket(tokens_per_minute, clock=clock)
+            if tokens_per_minute else None
+        )
+
+        self._admit = threading.Lock()
+        self._books = threading.Lock()
+        self._reserved = 0.0
+
+        self.calls = 0
+        self.refused = 0
+        self.waited = 0.0
+        self.spent = 0.0
+
+    def _cost(self, prompt_tokens: int, response_tokens: int) -> float:
+        return (
+            prompt_tokens * self.prompt_cost_per_1k
+            + response_tokens * self.response_cost_per_1k
+        ) / 1000
+
+    def _refuse(self, reason: str):
+        self.refused += 1
+        raise BudgetExceeded(reason)
+
+    def complete(self, prompt: str) -> str:
+        prompt_tokens = estimate_tokens(prompt)
+        tokens = prompt_tokens + self.max_response_tokens
+        reserve = self._cost(prompt_tokens, self.max_response_tokens)
+
+        with self._admit:
+            with self._books:
+                if (
+                    self.max_cost is not None
+                    and self.spent + self._reserved + reserve > self.max_cost
+                ):
+                    self._refuse(f"cost cap ({self.max_cost:g}) reached")
+                self._reserved += reserve
+
+                wait = max(
+                    self.requests.wait_time(1) if self.requests else 0.0,
+                    self.tokens.wait_time(tokens) if self.tokens else 0.0,
+                )
+                if self.deadline is not None and self.clock() + wait > self.deadline:
+                    self._reserved -= reserve
+                    self._refuse(f"rate limit (would wait {wait:.1f}s past the deadline)")
+
+            if wait > 0:
+                self.sleep(wait)
+                self.waited += wait
+
+            with self._books:
+                if self.requests:
+                    self.requests.take(1)
+                if self.tokens:
+                    self.tokens.take(tokens)
+                self.calls += 1
+
+        try:
+            raw = self.llm.complete(prompt)
+        except Exception:
+            with self._books:
+                self._reserved -= reserve
+            raise
+
+        response_tokens = estimate_tokens(raw)
+        with self._books:
+            # Unused response allowance goes back to the bucket
+            if self.tokens and response_tokens < self.max_response_tokens:
+                self.tokens.give(self.max_response_tokens - response_tokens)
+            self._reserved -= reserve
+            self.spent += self._cost(prompt_tokens, response_tokens)
+        return raw
@@ -0,0 +1,249 @@
+import heapq
+import multiprocessing as mp
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from detector import AnomalyDetectorV2, AnomalyV2, NearMiss
+from store import PatternKey, PatternStoreV2
+from v3.types import LogEvent
+
+
+def shard_for(service: str, shards: int) -> int:
+    """
+    Stable service -> shard mapping (independent of PYTHONHASHSEED).
+    """
+    return zlib.crc32(service.encode("utf-8")) % shards
+
+
+# ---------- Worker ----------
+
+def _worker(conn, store_kwargs: Dict[str, Any], detector_kwargs: Dict[str, Any], vectorized: bool):
+    store = PatternStoreV2(**store_kwargs)
+
+    detector_cls = AnomalyDetectorV2
+    if vectorized:
+        from vectorized import VectorizedDetectorV2
+        detector_cls = VectorizedDetectorV2
+    detector = detector_cls(store=store, **detector_kwargs)
+
+    while True:
+        try:
+            op, payload = conn.recv()
+        except EOFError:
+            return
+
+        if op == "add":
+            for event in payload:
+                store.add(event)
+            continue
+
+        if op == "close":
+            conn.close()
+            return
+
+        try:
+            if op == "detect":
+                result = detector.detect(payload)
+            elif op == "call":
+                method, args = payload
+                result = getattr(store, method)(*args)
+            elif op == "attr":
+                result = getattr(store, payload)
+            else:
+                raise ValueError(f"unknown shard op: {op}")
+            conn.send((True, result))
+        except Exception as e:
+            conn.send((False, repr(e)))
+
+
+# ---------- Coordinator ----------
+
+class ShardedStore:
+    """
+    Partitions patterns by service across worker processes, each with
+    its own PatternStoreV2 and detector.
+
+    Ingestion is batched per shard and fire-and-forget; detection and
+    queries are broadcast to every shard first and collected afterwards,
+    so shards work in parallel. Exposes the store read APIs used by
+    ContextBuilderV2 plus detect(), so it can stand in for both.
+    """
+
+    def __init__(
+        self,
+        shards: int,
+        store_kwargs: Dict[str, Any],
+        detector_kwargs: Dict[str, Any],
+        vectorized: bool = False,
+        batch_size: int = 2000,
+    ):
+        if shards < 1:
+            raise ValueError("shards must be >= 1")
+
+        self.shards = shards
+        self.batch_size = batch_size
+        self.window_size = store_kwargs["window_size"]
+        self.bucket_size = store_kwargs["bucket_size"]
+
+        self._conns = []
+        self._procs = []
+        self._pending: List[List[LogEvent]] = [[] for _ in range(shards)]
+        self._shard_of: Dict[str, int] = {}
+
+        for _ in range(shards):
+            parent, child = mp.Pipe()
+            proc = mp.Process(
+                target=_worker,
+                args=(child, store_kwargs, detector_kwargs, vectorized),
+                daemon=True,
+            )
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+
+    # ---------- Routing ----------
+
+    def _shard(self, service: str) -> int:
+        shard = self._shard_of.get(service)
+        if shard is None:
+            shard = self._shard_of[service] = shard_for(service, self.shards)
+        return shard
+
+    def _collect(self, shards: Sequence[int]) -> List[Any]:
+        results = []
+        for shard in shards:
+            ok, result = self._conns[shard].recv()
+            if not ok:
+                raise RuntimeError(f"shard {shard} failed: {result}")
+            results.append(result)
+        return results
+
+    def _broadcast(self, op: str, payload) -> List[Any]:
+        self.flush()
+        for conn in self._conns:
+            conn.send((op, payload))
+        return self._collect(range(self.shards))
+
+    def _call_key(self, key: PatternKey, method: str, *args):
+        shard = self._shard(key[0])
+        self._flush_shard(shard)
+        self._conns[shard].send(("call", (method, args)))
+        return self._collect([shard])[0]
+
+    # ---------- Write API ----------
+
+    def add(self, event: LogEvent) -> bool:
+        shard = self._shard(event.service)
+        pending = self._pending[shard]
+        pending.append(event)
+        if len(pending) >= self.batch_size:
+            self._flush_shard(shard)
+        return True
+
+    def _flush_shard(self, shard: int):
+        pending = self._pending[shard]
+        if pending:
+            self._conns[shard].send(("add", pending))
+            self._pending[shard] = []
+
+    def flush(self):
+        for shard in range(self.shards):
+            self._flush_shard(shard)
+
+    # ---------- Detection ----------
+
+    def detect(self, now: datetime) -> Tuple[List[AnomalyV2], List[NearMiss]]:
+        per_shard = self._broadcast("detect", now)
+
+        # Each shard's list is already sorted by severity (descending)
+        anomalies = list(
+            heapq.merge(
+                *(a for a, _ in per_shard),
+                key=lambda a: -a.severity,
+            )
+        )
+        near_misses = [n for _, shard_misses in per_shard for n in shard_misses]
+        return anomalies, near_misses
+
+    # ---------- Read API ----------
+
+    def get_activity_window(self, since: datetime, until: datetime) -> Dict[PatternKey, int]:
+        merged: Dict[PatternKey, int] = {}
+        for activity in self._broadcast("call", ("get_activity_window", (since, until))):
+            merged.update(activity)  # shards hold disjoint services
+        return merged
+
+    def get_patterns(self) -> List[PatternKey]:
+        return [k for keys in self._broadcast("call", ("get_patterns", ())) for k in keys]
+
+    def get_buckets(self, key: PatternKey):
+        return self._call_key(key, "get_buckets", key)
+
+    def get_buckets_many(self, keys: Iterable[PatternKey]) -> Dict[PatternKey, list]:
+        """
+        Buckets of many keys with one request per shard involved.
+        """
+        by_shard: Dict[int, List[PatternKey]] = {}
+        for key in keys:
+            by_shard.setdefault(self._shard(key[0]), []).append(key)
+
+        for shard, shard_keys in by_shard.items():
+            self._flush_shard(shard)
+            self._conns[shard].send(("call", ("get_buckets_many", (shard_keys,))))
+
+        merged: Dict[PatternKey, list] = {}
+        for buckets in self._collect(list(by_shard)):
+            merged.update(buckets)
+        return merged
+
+    def get_stats(self, key: PatternKey):
+        return self._call_key(key, "get_stats", key)
+
+    def get_exemplars(self, key: PatternKey):
+        return self._call_key(key, "get_exemplars", key)
+
+    def pattern_count(self) -> int:
+        return sum(self._broadcast("call", ("pattern_count", ())))
+
+    def estimate_bytes(self) -> int:
+        return sum(self._broadcast("call", ("estimate_bytes", ())))
+
+    def _sum_attr(self, name: str):
+        return sum(self._broadcast("attr", name))
+
+    @property
+    def late_accepted(self) -> int:
+        return self._sum_attr("late_accepted")
+
+    @property
+    def late_rejected(self) -> int:
+        return self._sum_attr("late_rejected")
+
+    @property
+    def evictions(self) -> Dict[str, int]:
+        merged: Dict[str, int] = {}
+        for counts in self._broadcast("attr", "evictions"):
+            for reason, count in counts.items():
+                merged[reason] = merged.get(reason, 0) + count
+        return merged
+
+    # ---------- Lifecycle ----------
+
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,291 @@
+import heapq
+import math
+from array import array
+from typing import Callable, Dict, Generic, Hashable, Iterable, List, Optional, Tuple, TypeVar
+
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+# ---------- Count-Min Sketch ----------
+
+_MASK_64 = (1 << 64) - 1
+
+
+class CountMinSketch:
+    """
+    Fixed-size frequency sketch.
+
+    Estimates never undercount; overcount is bounded by
+    total / width with high probability (controlled by depth).
+    Memory is width * depth 64-bit counters, independent of how many
+    distinct items are added.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self._rows = [array("q", bytes(8 * width)) for _ in range(depth)]
+
+    def _slots(self, item: Hashable) -> List[int]:
+        # Double hashing: every row's slot comes from one hash() call,
+        # h1 + i * h2, so a lookup costs a few small-int operations
+        h = hash(item) & _MASK_64
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        width = self.width
+        return [(h1 + i * h2) % width for i in range(self.depth)]
+
+    def add(self, item: Hashable, count: int = 1):
+        for row, slot in zip(self._rows, self._slots(item)):
+            row[slot] += count
+
+    def estimate(self, item: Hashable) -> int:
+        return min(
+            row[slot]
+            for row, slot in zip(self._rows, self._slots(item))
+        )
+
+    def estimate_many(self, items: Iterable[Hashable]) -> List[int]:
+        """
+        estimate() for several items, without per-item call overhead.
+        """
+        rows = self._rows
+        width = self.width
+        out = []
+        for item in items:
+            h = hash(item) & _MASK_64
+            h1 = h & 0xFFFFFFFF
+            h2 = (h >> 32) | 1
+            best = rows[0][h1 % width]
+            for i in range(1, len(rows)):
+                v = rows[i][(h1 + i * h2) % width]
+                if v < best:
+                    best = v
+            out.append(best)
+        return out
+
+    def nbytes(self) -> int:
+        return self.width * self.depth * 8
+
+
+# ---------- Space-Saving (top-K heavy hitters) ----------
+
+class SpaceSaving(Generic[K]):
+    """
+    Space-Saving heavy-hitter tracker with a fixed number of counters.
+
+    Any item whose true frequency exceeds total / capacity is guaranteed
+    to be monitored. When full, a new item replaces the current minimum
+    and inherits its count (recorded as the error bound).
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+
+        self.capacity = capacity
+        self.counts: Dict[K, int] = {}
+        self.errors: Dict[K, int] = {}
+
+        # Lazy min-heap of (count, seq, item); entries may be stale and
+        # are refreshed when they reach the top.
+        self._heap: List[Tuple[int, int, K]] = []
+        self._seq = 0
+
+    def __contains__(self, item: K) -> bool:
+        return item in self.counts
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def _push(self, count: int, item: K):
+        self._seq += 1
+        heapq.heappush(self._heap, (count, self._seq, item))
+
+    def offer(self, item: K, count: int = 1) -> Optional[K]:
+        """
+        Count `count` occurrences of item (weighted Space-Saving).
+
+        Returns the item that was evicted to make room, if any.
+        """
+        counts = self.counts
+        weight = count
+
+        if item in counts:
+            counts[item] += weight
+            return None
+
+        if len(counts) < self.capacity:
+            counts[item] = weight
+            self.errors[item] = 0
+            self._push(weight, item)
+            return None
+
+        heap = self._heap
+        while True:
+            count, _, victim = heap[0]
+            current = counts.get(victim)
+            if current is None:
+                # Discarded since it was pushed
+                heapq.heappop(heap)
+                continue
+            if current == count:
+                break
+            heapq.heapreplace(heap, (current, self._seq, victim))
+            self._seq += 1
+
+        heapq.heappop(heap)
+        del counts[victim]
+        del self.errors[victim]
+
+        counts[item] = count + weight
+        self.errors[item] = count
+        self._push(count + weight, item)
+        return victim
+
+    def discard(self, item: K):
+        """
+        Stop monitoring item (its heap entry is dropped lazily).
+        """
+        if self.counts.pop(item, None) is None:
+            return
+        del self.errors[item]
+
+        # Bound the stale entries left behind
+        if len(self._heap) > 2 * self.capacity:
+            self._heap = [
+                (count, seq, key)
+                for seq, (key, count) in enumerate(self.counts.items(), self._seq)
+            ]
+            heapq.heapify(self._heap)
+            self._seq += len(self._heap)
+
+    def top(self, k: Optional[int] = None) -> List[Tuple[K, int]]:
+        items = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)
+        return items if k is None else items[:k]
+
+
+# ---------- Recent-biased reservoir ----------
+
+class Reservoir(Generic[T]):
+    """
+    Fixed-size sample of a stream.
+
+    The n-th item is admitted with probability max(capacity / n, recency)
+    and replaces a random slot. With recency=0 this is uniform reservoir
+    sampling; a positive recency keeps turning the sample over at a
+    steady rate, so it follows what the stream looks like now.
+    """
+
+    __slots__ = ("capacity", "recency", "seen", "items", "_random")
+
+    def __init__(self, capacity: int, random: Callable[[], float], recency: float = 0.1):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+
+        self.capacity = capacity
+        self.recency = recency
+        self.seen = 0
+        self.items: List[T] = []
+        self._random = random
+
+    def slot(self) -> int:
+        """
+        Count one stream item. Returns the index to store it at
+        (len(items) means append), or -1 to drop it, so callers only
+        build items that are kept.
+        """
+        self.seen += 1
+        if len(self.items) < self.capacity:
+            return len(self.items)
+
+        u = self._random()
+        if u * self.seen < self.capacity or u < self.recency:
+            return int(self._random() * self.capacity)
+        return -1
+
+
+# ---------- Quantile sketch ----------
+
+class QuantileSketch:
+    """
+    DDSketch-style quantile sketch.
+
+    Positive values fall into logarithmic bins of ratio
+    gamma = (1 + a) / (1 - a), so every quantile is returned within
+    relative error a. At most max_bins bins are kept (the lowest are
+    collapsed into their neighbour when exceeded), so memory is fixed
+    and high quantiles stay accurate. Sketches with the same settings
+    merge by adding bins.
+    """
+
+    __slots__ = ("relative_accuracy", "max_bins", "_log_gamma", "bins", "zero", "count")
+
+    def __init__(self, relative_accuracy: float = 0.05, max_bins: int = 128):
+        if not 0.0 < relative_accuracy < 1.0:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._log_gamma = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self.bins: Dict[int, int] = {}
+        self.zero = 0   # values <= 0
+        self.count = 0
+
+    def add(self, value: float, count: int = 1):
+        self.count += count
+        if value <= 0.0:
+            self.zero += count
+            return
+
+        idx = math.ceil(math.log(value) / self._log_gamma)
+        bins = self.bins
+        bins[idx] = bins.get(idx, 0) + count
+        if len(bins) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self):
+        ordered = sorted(self.bins)
+        bins = self.bins
+        excess = len(bins) - self.max_bins
+        target = ordered[excess]
+        for idx in ordered[:excess]:
+            bins[target] += bins.pop(idx)
+
+    def merge(self, other: "QuantileSketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge sketches with different accuracy")
+        bins = self.bins
+        for idx, count in other.bins.items():
+            bins[idx] = bins.get(idx, 0) + count
+        self.zero += other.zero
+        self.count += other.count
+        if len(bins) > self.max_bins:
+            self._collapse()
+
+    def quantile(self, q: float) -> float:
+        """
+        Approximate q-quantile (0 <= q <= 1); 0.0 for an empty sketch.
+        """
+        if not self.count:
+            return 0.0
+
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if rank < seen:
+            return 0.0
+
+        idx = None
+        for idx in sorted(self.bins):
+            seen += self.bins[idx]
+            if seen > rank:
+                break
+
+        gamma = math.exp(self._log_gamma)
+        # Midpoint of the bin (gamma^(i-1), gamma^i] in relative terms
+        return 2.0 * gamma ** idx / (gamma + 1.0)
+
+    def nbytes(self) -> int:
+        return 120 + len(self.bins) * 80
@@ -1,15 +1,40 @@
-from collections import defaultdict, deque
+import random
+from collections import OrderedDict, deque
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from datetime import timezone
-from typing import Dict, List, Tuple
+from itertools import chain
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
+from metrics import REGISTRY, bind_gauge
+from sketch import CountMinSketch, QuantileSketch, Reservoir, SpaceSaving
 from v3.ingest import LogEvent
+from v3.types import EventBatch
 
 
 PatternKey = Tuple[str, str, str]  # (service, level, template)
 
 
+# Rough CPython sizes used for the footprint estimate (not exact accounting)
+PATTERN_OVERHEAD_BYTES = 640  # key tuple, stats object, deque, dict slots
+BUCKET_BYTES = 120            # (datetime, int) tuple + deque slot
+EXEMPLAR_BYTES = 160          # Exemplar object + list slot, excluding the line
+SKETCH_BYTES = 2400           # QuantileSketch with a few dozen bins
+
+
+# Exemplar lines are cut to this many characters
+EXEMPLAR_CHARS = 512
+
+
+# Coarser history tiers as (bucket_size, retention). Fine buckets that age
+# out of the window roll into the first tier, and so on down the list.
+DEFAULT_ROLLUPS: Tuple[Tuple[timedelta, timedelta], ...] = (
+    (timedelta(minutes=10), timedelta(days=1)),
+    (timedelta(hours=1), timedelta(days=7)),
+)
+
+
 LEVEL_WEIGHTS = {
     "ERROR": 5.0,
     "WARN": 2.0,
@@ -18,6 +43,42 @@ LEVEL_WEIGHTS = {
 }
 
 
+# ---------- Metrics ----------
+
+STORE_PATTERNS = REGISTRY.gauge(
+    "stackoracle_store_patterns",
+    "Patterns currently tracked by the pattern store",
+)
+STORE_BUCKETS = REGISTRY.gauge(
+    "stackoracle_store_buckets",
+    "Buckets (fine and rollup) held by the pattern store",
+)
+STORE_BYTES = REGISTRY.gauge(
+    "stackoracle_store_bytes_estimate",
+    "Estimated pattern store memory footprint in bytes",
+)
+LATE_EVENTS = REGISTRY.counter(
+    "stackoracle_store_late_events_total",
+    "Out-of-order events, by outcome",
+    ["outcome"],
+)
+EVICTIONS = REGISTRY.counter(
+    "stackoracle_store_evictions_total",
+    "Patterns evicted from the store, by reason",
+    ["reason"],
+)
+
+_LATE_ACCEPTED = LATE_EVENTS.labels("accepted")
+_LATE_REJECTED = LATE_EVENTS.labels("rejected")
+
+
+@dataclass(frozen=True)
+class Exemplar:
+    timestamp: datetime
+    line: str
+    request_id: Optional[str]
+
+
 @dataclass
 class PatternStats:
     total_count: int
@@ -26,59 +87,657 @@ class PatternStats:
 
 
 class PatternStoreV2:
-    def __init__(self, window_size: timedelta, bucket_size: timedelta):
+    def __init__(
+        self,
+        window_size: timedelta,
+        bucket_size: timedelta,
+        allowed_lateness: timedelta = timedelta(minutes=1),
+        max_patterns_per_service: Optional[int] = None,
+        sketch_width: int = 2048,
+        sketch_depth: int = 4,
+        idle_ttl: Optional[timedelta] = None,
+        max_patterns: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        rollups: Sequence[Tuple[timedelta, timedelta]] = (),
+        track_changes: bool = False,
+        exemplars: int = 0,
+        exemplar_recency: float = 0.1,
+        track_values: bool = False,
+    ):
         self.window_size = window_size
         self.bucket_size = bucket_size
+        self._bucket_seconds = int(bucket_size.total_seconds())
+        self._bucket_starts: Dict[int, datetime] = {}
+
+        # Events older than (latest event time - allowed_lateness) are rejected.
+        self.allowed_lateness = allowed_lateness
+
+        # key -> deque[(bucket_start, count)], sorted by bucket_start
+        self._buckets: Dict[PatternKey, deque[Tuple[datetime, int]]] = {}
+
+        # key -> stats, least recently updated first (LRU order)
+        self._stats: OrderedDict[PatternKey, PatternStats] = OrderedDict()
+
+        # ---- Event-time watermark ----
+        self._max_seen: Optional[datetime] = None
+        self.late_accepted = 0
+        self.late_rejected = 0
+
+        # ---- Heavy-hitter mode (bounded memory) ----
+        # Exact buckets are kept only for the top-K patterns per service.
+        # Everything is also counted into a Count-Min sketch keyed by
+        # (pattern, bucket), so a tail pattern that starts spiking gets
+        # its recent history estimated when it enters the top-K.
+        self.max_patterns_per_service = max_patterns_per_service
+        self._heavy: Optional[Dict[str, SpaceSaving[PatternKey]]] = None
+        self._cms: Optional[CountMinSketch] = None
+
+        # Patterns that entered the top-K by replacing another -> bucket
+        # they entered in. Until a later bucket is counted they only hold
+        # exact counts since entry; their history is then estimated from
+        # the sketch once, so tail patterns that churn straight back out
+        # never pay for it.
+        self._seeded: Dict[PatternKey, datetime] = {}
+
+        if max_patterns_per_service is not None:
+            self._heavy = {}
+            self._cms = CountMinSketch(width=sketch_width, depth=sketch_depth)
+
+        # ---- Idle eviction and memory budget ----
+        # idle_ttl: drop patterns not seen for this long (event time).
+        # max_patterns / max_bytes: when exceeded, drop least recently
+        # seen patterns until back under budget.
+        self.idle_ttl = idle_ttl
+        self.max_patterns = max_patterns
+        self.max_bytes = max_bytes
+
+        self.evictions: Dict[str, int] = {"idle": 0, "capacity": 0, "sketch": 0}
 
-        # key -> deque[(bucket_start, count)]
-        self._buckets: Dict[PatternKey, deque[Tuple[datetime, int]]] = defaultdict(deque)
+        self._n_buckets = 0
+        self._template_bytes = 0
+        self._last_sweep: Optional[datetime] = None
 
-        # key -> stats
-        self._stats: Dict[PatternKey, PatternStats] = {}
+        # ---- Multi-resolution history ----
+        # key -> one deque per rollup tier of (bucket_start, count, n),
+        # where n is how many fine buckets were merged into the entry.
+        self.rollups = tuple(rollups)
+        self._history: Dict[PatternKey, List[deque[Tuple[datetime, int, int]]]] = {}
+
+        # ---- Change tracking for delta export ----
+        # key -> bucket starts touched since the last drain_changes()
+        self._changed: Optional[Dict[PatternKey, Set[datetime]]] = (
+            {} if track_changes else None
+        )
+
+        # ---- Exemplars ----
+        # Up to `exemplars` sampled raw lines per pattern (see Reservoir)
+        self.exemplars = exemplars
+        self.exemplar_recency = exemplar_recency
+        self._exemplars: Dict[PatternKey, Reservoir[Exemplar]] = {}
+        self._exemplar_bytes = 0
+        self._random = random.Random(0).random
+
+        # ---- Numeric values (e.g. latencies) ----
+        # key -> deque[(bucket_start, QuantileSketch)], aligned with the
+        # fine buckets and evicted with them. Sketches have a fixed bin
+        # cap, so memory per pattern is bounded by the window.
+        self.track_values = track_values
+        self._values: Dict[PatternKey, deque[Tuple[datetime, QuantileSketch]]] = {}
+        self._n_sketches = 0
+
+        # Gauges are computed on scrape, so they cost nothing per event
+        bind_gauge(STORE_PATTERNS, self, "pattern_count")
+        bind_gauge(STORE_BUCKETS, self, "bucket_count")
+        bind_gauge(STORE_BYTES, self, "estimate_bytes")
 
     # ---------- Internal helpers ----------
 
+    def bucket_start(self, ts: datetime) -> datetime:
+        return self._bucket_start(ts)
+
     def _bucket_start(self, ts: datetime) -> datetime:
+        return self._bucket_at(int(ts.timestamp()))
+
+    def _bucket_at(self, seconds: int) -> datetime:
+        # Bucket starts are interned: one datetime per bucket boundary
+        # instead of one per pattern, and its cached hash makes batch
+        # exports cheap. Takes epoch seconds so add_batch() can skip
+        # building a datetime per row.
+        start = seconds - (seconds % self._bucket_seconds)
+        bucket_ts = self._bucket_starts.get(start)
+        if bucket_ts is None:
+            if len(self._bucket_starts) >= 65536:
+                self._bucket_starts.clear()
+            bucket_ts = datetime.fromtimestamp(start, tz=timezone.utc)
+            self._bucket_starts[start] = bucket_ts
+        return bucket_ts
+
+    @staticmethod
+    def _align(ts: datetime, size: timedelta) -> datetime:
         seconds = int(ts.timestamp())
-        bucket_seconds = int(self.bucket_size.total_seconds())
+        bucket_seconds = int(size.total_seconds())
         return datetime.fromtimestamp(
             seconds - (seconds % bucket_seconds),
             tz=timezone.utc,
         )
 
+    def watermark(self) -> Optional[datetime]:
+        """
+        Oldest event time still accepted by add().
+        """
+        if self._max_seen is None:
+            return None
+        return self._max_seen - self.allowed_lateness
+
+    def window_start(self) -> Optional[datetime]:
+        """
+        Oldest bucket time inside the fine-bucket window of the newest
+        event seen; older buckets are stale.
+        """
+        if self._max_seen is None:
+            return None
+        return self._max_seen - self.window_size
+
     def _evict_old(self, key: PatternKey, now: datetime):
         cutoff = now - self.window_size
         buckets = self._buckets[key]
         while buckets and buckets[0][0] < cutoff:
-            buckets.popleft()
+            ts, count = buckets.popleft()
+            self._n_buckets -= 1
+            if self.rollups:
+                self._roll_up(key, 0, ts, count, 1)
+
+        sketches = self._values.get(key) if self._values else None
+        if sketches:
+            while sketches and sketches[0][0] < cutoff:
+                sketches.popleft()
+                self._n_sketches -= 1
+
+        if self.rollups and key in self._history:
+            self._compact(key, now)
+
+    def _roll_up(
+        self,
+        key: PatternKey,
+        tier: int,
+        ts: datetime,
+        count: int,
+        n: int,
+    ):
+        tiers = self._history.get(key)
+        if tiers is None:
+            tiers = [deque() for _ in self.rollups]
+            self._history[key] = tiers
+
+        rollup = tiers[tier]
+        start = self._align(ts, self.rollups[tier][0])
+
+        # Aged buckets arrive oldest first, so this is almost always the tail
+        idx = len(rollup) - 1
+        while idx >= 0 and rollup[idx][0] > start:
+            idx -= 1
+
+        if idx >= 0 and rollup[idx][0] == start:
+            _, c, m = rollup[idx]
+            rollup[idx] = (start, c + count, m + n)
+        else:
+            rollup.insert(idx + 1, (start, count, n))
+            self._n_buckets += 1
+
+    def _compact(self, key: PatternKey, now: datetime):
+        tiers = self._history[key]
+        last = len(tiers) - 1
+
+        for tier, rollup in enumerate(tiers):
+            cutoff = now - self.rollups[tier][1]
+            while rollup and rollup[0][0] < cutoff:
+                ts, count, n = rollup.popleft()
+                self._n_buckets -= 1
+                if tier < last:
+                    self._roll_up(key, tier + 1, ts, count, n)
+
+    def _remove(self, key: PatternKey, reason: str):
+        if key not in self._stats and key not in self._buckets:
+            return
+        if self._heavy is not None:
+            tracker = self._heavy.get(key[0])
+            if tracker is not None:
+                tracker.discard(key)
+            self._seeded.pop(key, None)
+
+        buckets = self._buckets.pop(key, None)
+        if buckets is not None:
+            self._n_buckets -= len(buckets)
+            self._template_bytes -= len(key[2])
+        tiers = self._history.pop(key, None)
+        if tiers is not None:
+            self._n_buckets -= sum(len(t) for t in tiers)
+        sketches = self._values.pop(key, None)
+        if sketches is not None:
+            self._n_sketches -= len(sketches)
+        reservoir = self._exemplars.pop(key, None)
+        if reservoir is not None:
+            self._exemplar_bytes -= sum(
+                EXEMPLAR_BYTES + len(e.line) for e in reservoir.items
+            )
+        self._stats.pop(key, None)
+        self.evictions[reason] += 1
+        EVICTIONS.labels(reason).inc()
+
+    def _enforce_budget(self, keep: PatternKey):
+        stats = self._stats
+        while stats and (
+            (self.max_patterns is not None and len(stats) > self.max_patterns)
+            or (self.max_bytes is not None and self.estimate_bytes() > self.max_bytes)
+        ):
+            oldest = next(iter(stats))
+            if oldest == keep:
+                break
+            self._remove(oldest, "capacity")
+
+    def evict_idle(self, now: Optional[datetime] = None) -> int:
+        """
+        Drop patterns whose last event is older than now - idle_ttl.
+        Defaults to the store's own event-time high watermark.
+        """
+        now = now or self._max_seen
+        if self.idle_ttl is None or now is None:
+            return 0
+
+        cutoff = now - self.idle_ttl
+        removed = 0
+
+        # _stats is in LRU order, so idle patterns are at the front
+        while self._stats:
+            key, stats = next(iter(self._stats.items()))
+            if stats.last_seen >= cutoff:
+                break
+            self._remove(key, "idle")
+            removed += 1
+
+        return removed
+
+    def estimate_bytes(self) -> int:
+        """
+        Cheap O(1) estimate of the store's memory footprint.
+        """
+        total = (
+            len(self._buckets) * PATTERN_OVERHEAD_BYTES
+            + self._template_bytes
+            + self._n_buckets * BUCKET_BYTES
+            + self._exemplar_bytes
+            + self._n_sketches * SKETCH_BYTES
+        )
+        if self._cms is not None:
+            total += self._cms.nbytes()
+        return total
 
     # ---------- Write API ----------
 
-    def add(self, event: LogEvent):
+    def add(self, event: LogEvent) -> bool:
+        """
+        Count an event into its bucket.
+
+        Late events (older than the latest event seen) are placed into
+        their own bucket as long as they are within allowed_lateness.
+        Anything older is counted in late_rejected and dropped.
+
+        Returns False if the event was rejected.
+        """
+        ts = event.timestamp
+
+        if self._max_seen is None or ts > self._max_seen:
+            self._max_seen = ts
+        elif ts < self._max_seen:
+            if ts < self._max_seen - self.allowed_lateness:
+                self.late_rejected += 1
+                _LATE_REJECTED.inc()
+                return False
+            self.late_accepted += 1
+            _LATE_ACCEPTED.inc()
+
         key: PatternKey = (event.service, event.level, event.template)
-        bucket_ts = self._bucket_start(event.timestamp)
+        self._count(key, ts, 1)
 
-        buckets = self._buckets[key]
-        if not buckets or buckets[-1][0] != bucket_ts:
-            buckets.append((bucket_ts, 1))
+        if self.exemplars and key in self._buckets:
+            self._sample(key, ts, event.raw, event.request_id or event.trace_id)
+
+        if self.track_values and event.value is not None and key in self._buckets:
+            self._record_value(key, self._bucket_start(ts), event.value)
+
+        return True
+
+    def _record_value(self, key: PatternKey, bucket_ts: datetime, value: float):
+        sketches = self._values.get(key)
+        if sketches is None:
+            sketches = self._values[key] = deque()
+
+        # Same sorted-deque walk as _increment; almost always the tail
+        idx = len(sketches) - 1
+        while idx >= 0 and sketches[idx][0] > bucket_ts:
+            idx -= 1
+
+        if idx >= 0 and sketches[idx][0] == bucket_ts:
+            sketch = sketches[idx][1]
         else:
-            ts, count = buckets.pop()
-            buckets.append((ts, count + 1))
+            sketch = QuantileSketch()
+            sketches.insert(idx + 1, (bucket_ts, sketch))
+            self._n_sketches += 1
+
+        sketch.add(value)
 
-        self._evict_old(key, event.timestamp)
-        self._update_stats(key, event.timestamp)
+    def _sample(self, key: PatternKey, ts, raw: str, request_id: Optional[str]):
+        """
+        Offer a line to key's reservoir. ts may be an epoch in seconds;
+        it is only converted to a datetime when the line is kept.
+        """
+        reservoir = self._exemplars.get(key)
+        if reservoir is None:
+            reservoir = Reservoir(self.exemplars, self._random, self.exemplar_recency)
+            self._exemplars[key] = reservoir
+
+        slot = reservoir.slot()
+        if slot < 0:
+            return
+
+        if not isinstance(ts, datetime):
+            ts = datetime.fromtimestamp(ts, tz=timezone.utc)
+
+        line = raw.rstrip("\n")[:EXEMPLAR_CHARS]
+        exemplar = Exemplar(
+            timestamp=ts,
+            line=line,
+            request_id=request_id,
+        )
+
+        items = reservoir.items
+        if slot == len(items):
+            items.append(exemplar)
+            self._exemplar_bytes += EXEMPLAR_BYTES + len(line)
+        else:
+            self._exemplar_bytes += len(line) - len(items[slot].line)
+            items[slot] = exemplar
+
+    def add_batch(self, batch: EventBatch) -> int:
+        """
+        Count every row of an EventBatch.
 
-    def _update_stats(self, key: PatternKey, ts: datetime):
-        if key not in self._stats:
+        The watermark is checked row by row in input order, then accepted
+        rows are grouped by (pattern, bucket) and each group is counted
+        with one _count(), oldest bucket first. Exemplars and values are
+        offered per row afterwards, in order. Returns the number of rows
+        accepted.
+
+        Counts match add() per row with idle_ttl and rollups. Capacity
+        eviction (max_patterns, max_patterns_per_service, max_bytes) sees
+        patterns in group order rather than row order, so which patterns
+        survive can differ.
+        """
+        n = len(batch)
+        if not n:
+            return 0
+
+        epochs = batch.epochs
+        lateness = self.allowed_lateness.total_seconds()
+        bucket_seconds = self._bucket_seconds
+        max_epoch = self._max_seen.timestamp() if self._max_seen is not None else None
+
+        # Pattern ID triples -> one int per row (mixed radix, so any
+        # number of interned names fits); key tuples built once per code
+        n_levels = len(batch.level_names)
+        n_templates = len(batch.template_names)
+        codes = [
+            (s * n_levels + l) * n_templates + t
+            for s, l, t in zip(batch.services, batch.levels, batch.templates)
+        ]
+        keys: Dict[int, PatternKey] = {}
+
+        # (pattern code, bucket) -> [count, first epoch, last epoch]
+        groups: Dict[Tuple[int, int], list] = {}
+        accepted = []
+        late_accepted = late_rejected = 0
+
+        for row in range(n):
+            epoch = epochs[row]
+            if max_epoch is None or epoch > max_epoch:
+                max_epoch = epoch
+            elif epoch < max_epoch:
+                if epoch < max_epoch - lateness:
+                    late_rejected += 1
+                    continue
+                late_accepted += 1
+
+            code = codes[row]
+            seconds = int(epoch)
+            group = groups.get((code, seconds - seconds % bucket_seconds))
+            if group is None:
+                groups[(code, seconds - seconds % bucket_seconds)] = [1, epoch, epoch]
+                if code not in keys:
+                    keys[code] = (
+                        batch.service_names[batch.services[row]],
+                        batch.level_names[batch.levels[row]],
+                        batch.template_names[batch.templates[row]],
+                    )
+            else:
+                group[0] += 1
+                if epoch < group[1]:
+                    group[1] = epoch
+                if epoch > group[2]:
+                    group[2] = epoch
+            accepted.append(row)
+
+        self.late_accepted += late_accepted
+        self.late_rejected += late_rejected
+        if late_accepted:
+            _LATE_ACCEPTED.inc(late_accepted)
+        if late_rejected:
+            _LATE_REJECTED.inc(late_rejected)
+
+        # Oldest bucket first, advancing the watermark as add() would, so
+        # window and idle eviction see the event time of each group
+        for (code, _), (count, first, last) in sorted(
+            groups.items(), key=lambda kv: kv[0][1]
+        ):
+            key = keys[code]
+            first_ts = datetime.fromtimestamp(first, tz=timezone.utc)
+            last_ts = datetime.fromtimestamp(last, tz=timezone.utc)
+            if self._max_seen is None or first_ts > self._max_seen:
+                self._max_seen = first_ts
+            self._count(key, last_ts, count)
+            if last_ts > self._max_seen:
+                self._max_seen = last_ts
+            stats = self._stats.get(key)
+            if stats is not None and first_ts < stats.first_seen:
+                stats.first_seen = first_ts
+
+        if self.exemplars or (self.track_values and batch.values):
+            buckets = self._buckets
+            for row in accepted:
+                key = keys[codes[row]]
+                if key not in buckets:
+                    continue
+                if self.exemplars:
+                    self._sample(
+                        key,
+                        epochs[row],
+                        batch.raw[row],
+                        batch.request_ids[row] or batch.trace_ids[row],
+                    )
+                if self.track_values and batch.values:
+                    value = batch.values[row]
+                    if value is not None:
+                        self._record_value(
+                            key,
+                            self._bucket_at(int(epochs[row])),
+                            value,
+                        )
+
+        return len(accepted)
+
+    def merge_counts(
+        self,
+        key: PatternKey,
+        counts: Iterable[Tuple[datetime, int]],
+        first_seen: Optional[datetime] = None,
+        last_seen: Optional[datetime] = None,
+    ):
+        """
+        Fold externally counted (timestamp, count) pairs into key, e.g.
+        from another store's delta. Not subject to allowed_lateness: the
+        caller decides what is current. When known, first_seen / last_seen
+        set the pattern's stats instead of the bucket starts in counts.
+        """
+        if last_seen is not None and (self._max_seen is None or last_seen > self._max_seen):
+            self._max_seen = last_seen
+
+        # _count() stamps the stats with bucket starts; keep what was
+        # really seen before so the shipped range can replace them
+        stats = self._stats.get(key)
+        seen = (stats.first_seen, stats.last_seen) if stats is not None else None
+
+        for ts, count in counts:
+            if self._max_seen is None or ts > self._max_seen:
+                self._max_seen = ts
+            self._count(key, ts, count)
+
+        stats = self._stats.get(key)
+        if stats is None:
+            return
+        if first_seen is not None:
+            stats.first_seen = first_seen if seen is None else min(seen[0], first_seen)
+        if last_seen is not None:
+            stats.last_seen = last_seen if seen is None else max(seen[1], last_seen)
+
+    def _count(self, key: PatternKey, ts: datetime, count: int):
+        bucket_ts = self._bucket_start(ts)
+
+        if self._heavy is not None and self._track_heavy(key, bucket_ts, count):
+            if self._changed is not None:
+                self._changed[key] = {bucket_ts}
+        else:
+            if self._seeded and bucket_ts > self._seeded.get(key, bucket_ts):
+                self._seed_history(key)
+            buckets = self._buckets.get(key)
+            if buckets is None:
+                buckets = self._new_pattern(key, deque())
+            self._n_buckets += self._increment(buckets, bucket_ts, count)
+            if self._changed is not None:
+                changed = self._changed.get(key)
+                if changed is None:
+                    changed = self._changed[key] = set()
+                changed.add(bucket_ts)
+
+        self._evict_old(key, self._max_seen)
+        self._update_stats(key, ts, count)
+
+        if self.idle_ttl is not None and (
+            self._last_sweep is None or bucket_ts > self._last_sweep
+        ):
+            # Sweep at most once per bucket boundary
+            self._last_sweep = bucket_ts
+            self.evict_idle()
+
+        if self.max_patterns is not None or self.max_bytes is not None:
+            self._enforce_budget(key)
+
+    def _new_pattern(self, key: PatternKey, buckets: deque) -> deque:
+        self._buckets[key] = buckets
+        self._n_buckets += len(buckets)
+        self._template_bytes += len(key[2])
+        return buckets
+
+    def _increment(self, buckets: deque, bucket_ts: datetime, count: int = 1) -> int:
+        """
+        Count events into bucket_ts. Returns number of buckets created.
+        """
+        # Fast path: in-order event
+        if not buckets or buckets[-1][0] < bucket_ts:
+            buckets.append((bucket_ts, count))
+            return 1
+
+        # Late event: walk back from the newest bucket. Buckets are unique
+        # and sorted, so this is bounded by allowed_lateness / bucket_size.
+        idx = len(buckets) - 1
+        while idx >= 0 and buckets[idx][0] > bucket_ts:
+            idx -= 1
+
+        if idx >= 0 and buckets[idx][0] == bucket_ts:
+            buckets[idx] = (bucket_ts, buckets[idx][1] + count)
+            return 0
+
+        buckets.insert(idx + 1, (bucket_ts, count))
+        return 1
+
+    def _track_heavy(self, key: PatternKey, bucket_ts: datetime, count: int = 1) -> bool:
+        """
+        Update sketch state for key. Returns True if key just entered the
+        top-K by replacing another pattern; its history is estimated
+        later, by _seed_history().
+        """
+        self._cms.add((hash(key), bucket_ts), count)
+
+        tracker = self._heavy.get(key[0])
+        if tracker is None:
+            tracker = SpaceSaving(self.max_patterns_per_service)
+            self._heavy[key[0]] = tracker
+
+        evicted = tracker.offer(key, count)
+        if evicted is None:
+            return False
+
+        self._remove(evicted, "sketch")
+        self._new_pattern(key, deque([(bucket_ts, count)]))
+        self._seeded[key] = bucket_ts
+        return True
+
+    def _seed_history(self, key: PatternKey):
+        """
+        Replace key's buckets up to the one it entered the top-K in with
+        sketch estimates (which also cover what was counted since).
+        """
+        entered = self._seeded.pop(key)
+        buckets = self._buckets[key]
+
+        exact = [b for b in buckets if b[0] > entered]
+        seeded = self._estimate_buckets(key, entered)
+        self._n_buckets += len(seeded) + len(exact) - len(buckets)
+
+        buckets.clear()
+        buckets.extend(seeded)
+        buckets.extend(exact)
+        if self._changed is not None:
+            self._changed.setdefault(key, set()).update(b[0] for b in buckets)
+
+    def _estimate_buckets(self, key: PatternKey, until: datetime) -> List[Tuple[datetime, int]]:
+        ts = self._bucket_start(self._max_seen - self.window_size)
+        if ts < self._max_seen - self.window_size:
+            ts += self.bucket_size
+
+        starts = []
+        while ts <= until:
+            starts.append(ts)
+            ts += self.bucket_size
+
+        # Same item layout as _track_heavy: the key is hashed once
+        key_hash = hash(key)
+        estimates = self._cms.estimate_many([(key_hash, ts) for ts in starts])
+        return [(ts, count) for ts, count in zip(starts, estimates) if count]
+
+    def _update_stats(self, key: PatternKey, ts: datetime, count: int = 1):
+        stats = self._stats.get(key)
+        if stats is None:
             self._stats[key] = PatternStats(
-                total_count=1,
+                total_count=count,
                 first_seen=ts,
                 last_seen=ts,
             )
         else:
-            stats = self._stats[key]
-            stats.total_count += 1
-            stats.last_seen = ts
+            self._stats.move_to_end(key)
+            stats.total_count += count
+            if ts < stats.first_seen:
+                stats.first_seen = ts
+            if ts > stats.last_seen:
+                stats.last_seen = ts
 
     # ---------- Read APIs (V2 FIX) ----------
 
@@ -88,9 +747,126 @@ class PatternStoreV2:
     def get_buckets(self, key: PatternKey) -> List[Tuple[datetime, int]]:
         return list(self._buckets.get(key, []))
 
+    def get_buckets_many(
+        self,
+        keys: Iterable[PatternKey],
+    ) -> Dict[PatternKey, List[Tuple[datetime, int]]]:
+        return {key: self.get_buckets(key) for key in keys}
+
+    def get_history(self, key: PatternKey) -> List[Tuple[datetime, int, int]]:
+        """
+        Full history for key across rollup tiers and the fine window,
+        oldest first, as (bucket_start, count, fine_buckets_merged).
+        """
+        history: List[Tuple[datetime, int, int]] = []
+        for rollup in reversed(self._history.get(key, [])):
+            history.extend(rollup)
+        history.extend((ts, count, 1) for ts, count in self._buckets.get(key, []))
+        history.sort(key=lambda b: b[0])
+        return history
+
+    def bucket_columns(
+        self,
+    ) -> Tuple[List[PatternKey], List[datetime], List[int], List[int], List[int]]:
+        """
+        Export fine buckets in run-length coordinate form for batch consumers.
+
+        Returns (keys, bucket_starts, row_lengths, cols, counts):
+          - keys          : get_patterns() order
+          - bucket_starts : distinct bucket starts, first-seen order
+          - row_lengths   : number of buckets per key
+          - cols, counts  : one entry per bucket, rows concatenated in order
+        """
+        keys = list(self._buckets)
+        values = self._buckets.values()
+
+        row_lengths = list(map(len, values))
+        flat = list(chain.from_iterable(values))
+        if not flat:
+            return keys, [], row_lengths, [], []
+
+        starts = list(map(itemgetter(0), flat))
+        counts = list(map(itemgetter(1), flat))
+        col_of = {ts: i for i, ts in enumerate(dict.fromkeys(starts))}
+        cols = list(map(col_of.__getitem__, starts))
+
+        return keys, list(col_of), row_lengths, cols, counts
+
+    def drain_changes(self) -> Dict[PatternKey, List[Tuple[datetime, int]]]:
+        """
+        Current counts of every fine bucket touched since the last call,
+        per pattern, then reset. Buckets (or patterns) dropped from the
+        store in the meantime are skipped. Requires track_changes=True.
+        """
+        if self._changed is None:
+            raise RuntimeError("store was created without track_changes")
+
+        changes: Dict[PatternKey, List[Tuple[datetime, int]]] = {}
+        for key, touched in self._changed.items():
+            buckets = self._buckets.get(key)
+            if buckets:
+                current = [b for b in buckets if b[0] in touched]
+                if current:
+                    changes[key] = current
+
+        self._changed = {}
+        return changes
+
+    def get_exemplars(self, key: PatternKey) -> List[Exemplar]:
+        """
+        Sampled raw lines for key, oldest first.
+        """
+        reservoir = self._exemplars.get(key)
+        if reservoir is None:
+            return []
+        return sorted(reservoir.items, key=lambda e: e.timestamp)
+
+    def get_value_patterns(self) -> List[PatternKey]:
+        """
+        Patterns with captured numeric values in the window.
+        """
+        return [k for k, sketches in self._values.items() if sketches]
+
+    def get_value_sketch(
+        self,
+        key: PatternKey,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> QuantileSketch:
+        """
+        Merged value distribution of key's buckets in [since, until).
+        """
+        merged = QuantileSketch()
+        for ts, sketch in self._values.get(key, ()):
+            if since is not None and ts < since:
+                continue
+            if until is not None and ts >= until:
+                break
+            merged.merge(sketch)
+        return merged
+
+    def has_pattern(self, key: PatternKey) -> bool:
+        return key in self._stats
+
+    def is_estimated(self, key: PatternKey) -> bool:
+        """
+        True while key holds only counts since it entered the top-K,
+        until a later bucket is counted and its history is estimated.
+        """
+        return key in self._seeded
+
+    def estimated_patterns(self) -> Set[PatternKey]:
+        return set(self._seeded)
+
     def get_stats(self, key: PatternKey) -> PatternStats:
         return self._stats[key]
 
+    def pattern_count(self) -> int:
+        return len(self._buckets)
+
+    def bucket_count(self) -> int:
+        return self._n_buckets
+
     def get_weighted_count(
         self,
         key: PatternKey,
@@ -1,4 +1,6 @@
-from typing import Optional
+from typing import Iterable, Optional, Tuple
+
+from metrics import REGISTRY
 
 from .detect import detect_format, LogFormat
 from .parsers import (
@@ -6,8 +8,53 @@ from .parsers import (
     parse_timestamped,
     parse_kv,
 )
-from .normalize import normalize
-from .types import LogEvent
+from .normalize import normalize, normalize_with_values
+from .types import EventBatch, LogEvent
+
+
+# ---------- Metrics ----------
+
+LINES_TOTAL = REGISTRY.counter(
+    "stackoracle_ingest_lines_total",
+    "Raw log lines offered to ingestion",
+)
+PARSE_FAILURES = REGISTRY.counter(
+    "stackoracle_ingest_failures_total",
+    "Lines that did not produce an event, by reason",
+    ["reason"],
+)
+
+TRUNCATED = REGISTRY.counter(
+    "stackoracle_ingest_truncated_total",
+    "Lines and messages cut to the configured length limit",
+    ["part"],
+)
+TRUNCATED_LINES = TRUNCATED.labels("line")
+TRUNCATED_MESSAGES = TRUNCATED.labels("message")
+
+# Failure reasons
+UNRECOGNIZED_FORMAT = "unrecognized_format"
+PARSE_ERROR = "parse_error"
+LINE_TOO_LONG = "line_too_long"
+INTERNAL_ERROR = "internal_error"
+
+_FAILED = {
+    reason: PARSE_FAILURES.labels(reason)
+    for reason in (UNRECOGNIZED_FORMAT, PARSE_ERROR, LINE_TOO_LONG, INTERNAL_ERROR)
+}
+
+
+# ---------- Length limits ----------
+
+# Longer (first) lines are cut before parsing; JSON cannot be cut and
+# is rejected as LINE_TOO_LONG instead
+MAX_LINE_CHARS = 64 * 1024
+
+# Longer messages skip full normalization: only the first
+# OVERSIZE_PREFIX_CHARS are normalized, and the template is marked
+MAX_MESSAGE_CHARS = 4096
+OVERSIZE_PREFIX_CHARS = 256
+OVERSIZE_MARK = " <TRUNCATED>"
 
 
 def ingest_line(line: str) -> Optional[LogEvent]:
@@ -26,23 +73,71 @@ def ingest_line(line: str) -> Optional[LogEvent]:
       - return None on failure
       - be deterministic
     """
+    return ingest_line_with_reason(line)[0]
+
+
+def ingest_line_with_reason(
+    line: str,
+    capture_values: bool = False,
+    max_line_chars: int = MAX_LINE_CHARS,
+    max_message_chars: int = MAX_MESSAGE_CHARS,
+) -> Tuple[Optional[LogEvent], Optional[str]]:
+    """
+    Same as ingest_line, but also returns why a line was rejected
+    (None on success). With capture_values, the first number captured
+    by normalization is kept in LogEvent.value. See MAX_LINE_CHARS and
+    MAX_MESSAGE_CHARS for the length limits.
+    """
+    LINES_TOTAL.inc()
+
     try:
-        fmt = detect_format(line)
+        # Multi-line records (see v3.multiline) are parsed by their first
+        # line; the continuation stays in raw
+        head = line
+        nl = line.find("\n", 0, len(line) - 1)
+        if nl >= 0:
+            head = line[:nl]
+
+        fmt = detect_format(head)
+
+        if len(head) > max_line_chars:
+            if fmt == LogFormat.JSON:
+                _FAILED[LINE_TOO_LONG].inc()
+                return None, LINE_TOO_LONG
+            head = head[:max_line_chars]
+            TRUNCATED_LINES.inc()
 
         parsed = None
         if fmt == LogFormat.JSON:
-            parsed = parse_json(line)
+            parsed = parse_json(head)
         elif fmt == LogFormat.TIMESTAMP_TEXT:
-            parsed = parse_timestamped(line)
+            parsed = parse_timestamped(head)
         elif fmt == LogFormat.KEY_VALUE:
-            parsed = parse_kv(line)
+            parsed = parse_kv(head)
         else:
-            return None
+            _FAILED[UNRECOGNIZED_FORMAT].inc()
+            return None, UNRECOGNIZED_FORMAT
 
         if not parsed:
-            return None
+            _FAILED[PARSE_ERROR].inc()
+            return None, PARSE_ERROR
 
-        template = normalize(parsed.message)
+        message = parsed.message
+        oversize = len(message) > max_message_chars
+        if oversize:
+            message = message[:OVERSIZE_PREFIX_CHARS]
+            TRUNCATED_MESSAGES.inc()
+
+        value = None
+        if capture_values:
+            template, values = normalize_with_values(message)
+            if values:
+                value = values[0]
+        else:
+            template = normalize(message)
+
+        if oversize:
+            template += OVERSIZE_MARK
 
         return LogEvent(
             timestamp=parsed.timestamp,
@@ -50,8 +145,138 @@ def ingest_line(line: str) -> Optional[LogEvent]:
             level=parsed.level,
             template=template,
             raw=line,
-        )
+            request_id=parsed.request_id,
+            trace_id=parsed.trace_id,
+            value=value,
+        ), None
 
     except Exception:
         # Ingestion must never crash the system
-        return None
+        _FAILED[INTERNAL_ERROR].inc()
+        return None, INTERNAL_ERROR
+
+
+def ingest_batch(
+    lines: Iterable[str],
+    capture_values: bool = False,
+    max_line_chars: int = MAX_LINE_CHARS,
+    max_message_chars: int = MAX_MESSAGE_CHARS,
+) -> EventBatch:
+    """
+    Ingest many lines into one columnar EventBatch.
+
+    Same pipeline and failure reasons as ingest_line_with_reason, but no
+    LogEvent is built per line: rows go straight into the batch's
+    arrays, services / levels / templates are interned, and metrics are
+    updated once per batch. Never throws.
+    """
+    batch = EventBatch()
+    epochs = batch.epochs
+    levels = batch.levels
+    services = batch.services
+    templates = batch.templates
+    raw = batch.raw
+    request_ids = batch.request_ids
+    trace_ids = batch.trace_ids
+    values = batch.values
+
+    level_ids = {}
+    service_ids = {}
+    template_ids = {}
+    failures = batch.failures
+
+    # Looked up at call time so profiling.instrument() hooks apply
+    parsers = {
+        LogFormat.JSON: parse_json,
+        LogFormat.TIMESTAMP_TEXT: parse_timestamped,
+        LogFormat.KEY_VALUE: parse_kv,
+    }
+    detect = detect_format
+    norm = normalize
+    norm_values = normalize_with_values
+
+    n = 0
+    truncated_lines = 0
+    truncated_messages = 0
+    for line in lines:
+        n += 1
+        try:
+            head = line
+            nl = line.find("\n", 0, len(line) - 1)
+            if nl >= 0:
+                head = line[:nl]
+
+            fmt = detect(head)
+            if len(head) > max_line_chars:
+                if fmt == LogFormat.JSON:
+                    failures[LINE_TOO_LONG] = failures.get(LINE_TOO_LONG, 0) + 1
+                    continue
+                head = head[:max_line_chars]
+                truncated_lines += 1
+
+            parser = parsers.get(fmt)
+            if parser is None:
+                failures[UNRECOGNIZED_FORMAT] = failures.get(UNRECOGNIZED_FORMAT, 0) + 1
+                continue
+
+            parsed = parser(head)
+            if not parsed:
+                failures[PARSE_ERROR] = failures.get(PARSE_ERROR, 0) + 1
+                continue
+
+            message = parsed.message
+            oversize = len(message) > max_message_chars
+            if oversize:
+                message = message[:OVERSIZE_PREFIX_CHARS]
+                truncated_messages += 1
+
+            if capture_values:
+                template, captured = norm_values(message)
+                value = captured[0] if captured else None
+            else:
+                template = norm(message)
+
+            if oversize:
+                template += OVERSIZE_MARK
+
+            epoch = parsed.timestamp.timestamp()
+
+            level = level_ids.get(parsed.level)
+            if level is None:
+                level = level_ids[parsed.level] = len(level_ids)
+                batch.level_names.append(parsed.level)
+            service = service_ids.get(parsed.service)
+            if service is None:
+                service = service_ids[parsed.service] = len(service_ids)
+                batch.service_names.append(parsed.service)
+            template_id = template_ids.get(template)
+            if template_id is None:
+                template_id = template_ids[template] = len(template_ids)
+                batch.template_names.append(template)
+
+        except Exception:
+            # Ingestion must never crash the system
+            failures[INTERNAL_ERROR] = failures.get(INTERNAL_ERROR, 0) + 1
+            continue
+
+        epochs.append(epoch)
+        levels.append(level)
+        services.append(service)
+        templates.append(template_id)
+        raw.append(line)
+        request_ids.append(parsed.request_id)
+        trace_ids.append(parsed.trace_id)
+        if capture_values:
+            values.append(value)
+
+    batch.lines = n
+    LINES_TOTAL.inc(n)
+    if truncated_lines:
+        TRUNCATED_LINES.inc(truncated_lines)
+    if truncated_messages:
+        TRUNCATED_MESSAGES.inc(truncated_messages)
+    for reason, count in failures.items():
+        _FAILED[reason].inc(count)
+
+    return batch
+
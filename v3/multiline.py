@@ -0,0 +1,140 @@
+import re
+import time
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from .detect import detect_format, LogFormat
+
+
+# Unindented lines that still belong to the previous event
+CONTINUATION_PREFIXES = (
+    "Traceback (most recent call last):",
+    "Caused by:",
+    "During handling of the above exception",
+    "The above exception was the direct cause",
+    "...",
+)
+
+KV_TIMESTAMP_RE = re.compile(r"\b(?:timestamp|time|ts)=")
+
+
+def starts_event(line: str) -> bool:
+    """
+    True if line looks like the first line of a log event: a JSON
+    object, an ISO-timestamped line, or logfmt with a timestamp key.
+    """
+    if not line or line[0] in " \t":
+        return False
+    if line.startswith(CONTINUATION_PREFIXES):
+        return False
+
+    fmt = detect_format(line)
+    if fmt == LogFormat.JSON or fmt == LogFormat.TIMESTAMP_TEXT:
+        return True
+    if fmt == LogFormat.KEY_VALUE:
+        return KV_TIMESTAMP_RE.search(line) is not None
+    return False
+
+
+class LineAssembler:
+    """
+    Streaming stage in front of ingestion that folds continuation lines
+    (stack frames, "Caused by:", exception lines, blank lines inside a
+    traceback) into the event line that precedes them.
+
+    A record is emitted when the next event line arrives, on flush(), or
+    by poll() once it has been pending for flush_after seconds.
+    A record holds at most max_lines lines and max_bytes characters;
+    further continuation lines are dropped and counted in `truncated`.
+    """
+
+    def __init__(
+        self,
+        max_lines: int = 500,
+        max_bytes: int = 64 * 1024,
+        flush_after: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.flush_after = flush_after
+        self.clock = clock
+
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        self._since = 0.0
+
+        self.records = 0
+        self.folded = 0
+        self.truncated = 0
+
+    def feed(self, line: str) -> Optional[str]:
+        """
+        Offer one physical line. Returns a completed record, if any.
+
+        Only the line itself decides where a record ends; flush_after is
+        applied by poll(), so how a file is split does not depend on how
+        fast it is read.
+        """
+        if not self._pending:
+            self._start(line)
+            return None
+
+        if starts_event(line):
+            done = self.flush()
+            self._start(line)
+            return done
+
+        # Continuation of the pending event
+        if (
+            len(self._pending) >= self.max_lines
+            or self._pending_bytes + len(line) > self.max_bytes
+        ):
+            self.truncated += 1
+            return None
+
+        self._pending.append(line)
+        self._pending_bytes += len(line)
+        self.folded += 1
+        return None
+
+    def _start(self, line: str):
+        self._pending = [line]
+        self._pending_bytes = len(line)
+        self._since = self.clock()
+
+    def poll(self) -> Optional[str]:
+        """
+        Emit the pending record if it has waited longer than flush_after
+        (for live tails where the next event may be a long way off).
+        """
+        if self._pending and self.clock() - self._since > self.flush_after:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[str]:
+        if not self._pending:
+            return None
+        pending = self._pending
+        self._pending = []
+        self._pending_bytes = 0
+        self.records += 1
+
+        if len(pending) == 1:
+            return pending[0]
+        # Lines keep their own newlines; make sure each is separated
+        return "\n".join(p.rstrip("\n") for p in pending) + "\n"
+
+
+def assemble(lines: Iterable[str], assembler: Optional[LineAssembler] = None) -> Iterator[str]:
+    """
+    Fold continuation lines of an iterable of physical lines into
+    multi-line records.
+    """
+    assembler = assembler or LineAssembler()
+    for line in lines:
+        record = assembler.feed(line)
+        if record is not None:
+            yield record
+    record = assembler.flush()
+    if record is not None:
+        yield record
@@ -1,12 +1,52 @@
 import re
-from typing import List, Tuple
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class NormalizationRule:
+    """
+    One ordered rewrite step.
+
+    `literal` / `prefilter` are cheap necessary conditions: if the text
+    does not contain the literal (or the prefilter finds nothing), the
+    rule cannot match and is skipped. They never change results, only
+    avoid running `pattern` when it is pointless.
+
+    With `capture`, group 1 of `pattern` is a number that
+    normalize_with_values() reports before it is replaced.
+    """
+    name: str
+    pattern: re.Pattern
+    token: str
+    literal: Optional[str] = None
+    prefilter: Optional[re.Pattern] = None
+    capture: bool = False
+
+
+HAS_DIGIT = re.compile(r"\d")
+
+
+def _needs(text: str, flags: int = 0) -> re.Pattern:
+    return re.compile(re.escape(text), flags)
 
 
 # Ordered normalization rules.
 # Order matters: more specific patterns must come first.
-NORMALIZATION_RULES: List[Tuple[re.Pattern, str]] = [
+NORMALIZATION_RULES: List[NormalizationRule] = [
+    # Correlation IDs (request_id=..., trace_id=...); they are carried
+    # on LogEvent, so they must not split templates
+    NormalizationRule(
+        "correlation_id",
+        re.compile(r"\b(request_id|req_id|trace_id)=[\w.:-]+"),
+        r"\1=<REQUEST_ID>",
+        literal="_id=",
+    ),
+
     # UUIDs (canonical)
-    (
+    NormalizationRule(
+        "uuid",
         re.compile(
             r"\b[0-9a-f]{8}-[0-9a-f]{4}-"
             r"[0-9a-f]{4}-[0-9a-f]{4}-"
@@ -14,135 +54,218 @@ NORMALIZATION_RULES: List[Tuple[re.Pattern, str]] = [
             re.IGNORECASE,
         ),
         "<UUID>",
+        literal="-",
     ),
 
     # IPv4 addresses
-    (
+    NormalizationRule(
+        "ipv4",
         re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}\b"),
         "<IP>",
+        literal=".",
+        prefilter=HAS_DIGIT,
     ),
 
     # Durations like 5000ms, 120ms
-    (
-        re.compile(r"\b\d+ms\b"),
+    NormalizationRule(
+        "duration_ms",
+        re.compile(r"\b(\d+)ms\b"),
         "<TIMEOUT>ms",
+        literal="ms",
+        capture=True,
     ),
 
     # Floating point numbers
-    (
+    NormalizationRule(
+        "float",
         re.compile(r"\b\d+\.\d+\b"),
         "<FLOAT>",
+        literal=".",
+        prefilter=HAS_DIGIT,
     ),
 
     # Plain integers (IDs, counts, etc.)
-    (
+    NormalizationRule(
+        "integer",
         re.compile(r"\b\d+\b"),
         "<NUM>",
+        prefilter=HAS_DIGIT,
     ),
 
     #Python with IDs
-    (
+    NormalizationRule(
+        "path_id",
         re.compile(r"/(users|orders|payments|sessions)/\d+"),
         r"/\1/<ID>",
+        literal="/",
+        prefilter=HAS_DIGIT,
     ),
 
     #HTTP status code
-    (
+    NormalizationRule(
+        "http_status",
         re.compile(r"\b[1-5]\d{2}\b"),
         "<HTTP_STATUS>",
+        prefilter=HAS_DIGIT,
     ),
 
     #Methods
-    (
+    NormalizationRule(
+        "http_method",
         re.compile(r"\b(GET|POST|PUT|DELETE|PATCH)\b"),
         "<HTTP_METHOD>",
     ),
 
 
     #SQL ERROR Codes
-    (
+    NormalizationRule(
+        "sql_code",
         re.compile(r"\bSQL error code \d+\b", re.IGNORECASE),
         "SQL error code <SQL_CODE>",
+        prefilter=_needs("error code ", re.IGNORECASE),
     ),
 
     #Query Durations
-    (
+    NormalizationRule(
+        "query_duration",
         re.compile(r"violates constraint \".+?\"", re.IGNORECASE),
         "query took <DURATION>ms",
+        prefilter=_needs("violates constraint \"", re.IGNORECASE),
     ),
 
     #Postgres violates
-    (
+    NormalizationRule(
+        "pg_constraint",
         re.compile(r"violates constraint \".+?\"", re.IGNORECASE),
         'violates constraint "<CONSTRAINT>"',
+        prefilter=_needs("violates constraint \"", re.IGNORECASE),
     ),
 
     # TIMEOUTS and Latency
-    (
+    NormalizationRule(
+        "timeout",
         re.compile(r"timeout after \d+ms", re.IGNORECASE),
         "timeout after <DURATION>ms",
+        prefilter=_needs("timeout after ", re.IGNORECASE),
     ),
 
-    (
+    NormalizationRule(
+        "slow_response",
         re.compile(r"slow response time=\d+ms", re.IGNORECASE),
         "slow response time=<DURATION>ms",
+        prefilter=_needs("slow response time=", re.IGNORECASE),
     ),
 
     # AUTHS adn Security
 
     #USER_ID
-    (
+    NormalizationRule(
+        "user_id",
         re.compile(r"user_id=\d+", re.IGNORECASE),
         "user_id=<USER_ID>",
+        prefilter=_needs("user_id=", re.IGNORECASE),
     ),
 
     #AUTH faliure
-    (
+    NormalizationRule(
+        "auth_error",
         re.compile(r"(invalid|expired) token", re.IGNORECASE),
         "<AUTH_ERROR>",
+        prefilter=_needs(" token", re.IGNORECASE),
     ),
 
     #Messaging / queues
 
     #kaffka offset
-    (
+    NormalizationRule(
+        "kafka_offset",
         re.compile(r"offset \d+", re.IGNORECASE),
         "offset <OFFSET>",
+        prefilter=_needs("offset ", re.IGNORECASE),
     ),
 
     #Partition ID's
-    (
+    NormalizationRule(
+        "partition",
         re.compile(r"partition \d+", re.IGNORECASE),
         "partition <PARTITION>",
+        prefilter=_needs("partition ", re.IGNORECASE),
     ),
 
     #JVM/ python runtime errors
 
     #java
-    (
+    NormalizationRule(
+        "java_exception",
         re.compile(r"java\.lang\.[A-Za-z]+Exception"),
         "java.lang.<EXCEPTION>",
+        literal="java.lang.",
     ),
 
     #python trace IDs
-    (
+    NormalizationRule(
+        "python_traceback",
         re.compile(r"Traceback \(most recent call last\):"),
         "<PYTHON_TRACEBACK>",
+        literal="Traceback (most recent call last):",
     ),
 
     #Devlopment / Infra Signals
-    (
+    NormalizationRule(
+        "version",
         re.compile(r"version=\d+\.\d+\.\d+"),
          "version=<VERSION>",
+        literal="version=",
     ),
-    
-    (
+
+    NormalizationRule(
+        "pod_id",
         re.compile(r"pod-[a-z0-9\-]+"),
         "pod-<POD_ID>",
+        literal="pod-",
     ),
 ]
 
 
+# ---------- Rule statistics ----------
+
+@dataclass
+class RuleStats:
+    evaluated: int = 0      # messages the rule was considered for
+    skipped: int = 0        # ... of which the prefilter ruled it out
+    matched: int = 0        # messages where the rule rewrote something
+    substitutions: int = 0  # total replacements made
+    seconds: float = 0.0    # time in prefilter + pattern
+
+
+_rule_stats: Optional[Dict[str, RuleStats]] = None
+
+
+def enable_rule_stats(enabled: bool = True):
+    """
+    Turn per-rule counters on or off. Off by default; when off,
+    normalize() pays a single check per message.
+    """
+    global _rule_stats
+    _rule_stats = (
+        {rule.name: RuleStats() for rule in NORMALIZATION_RULES}
+        if enabled
+        else None
+    )
+
+
+def rule_stats() -> List[Dict[str, object]]:
+    """
+    Export per-rule statistics in rule order, e.g. for JSON.
+    """
+    if _rule_stats is None:
+        return []
+    return [
+        {"rule": name, **vars(stats)}
+        for name, stats in _rule_stats.items()
+    ]
+
+
 def normalize(message: str) -> str:
     """
     Normalize a log message into a stable template.
@@ -157,9 +280,75 @@ def normalize(message: str) -> str:
     if not message:
         return ""
 
+    if _rule_stats is not None:
+        return _normalize_with_stats(message, _rule_stats)
+
+    normalized = message
+
+    for rule in NORMALIZATION_RULES:
+        if rule.literal is not None and rule.literal not in normalized:
+            continue
+        if rule.prefilter is not None and rule.prefilter.search(normalized) is None:
+            continue
+        normalized = rule.pattern.sub(rule.token, normalized)
+
+    return normalized
+
+
+def normalize_with_values(message: str) -> Tuple[str, List[float]]:
+    """
+    Same as normalize(), also returning the numbers captured by rules
+    with capture=True (e.g. the 350 in "350ms"), in order.
+    """
+    values: List[float] = []
+    if not message:
+        return "", values
+
+    if _rule_stats is not None:
+        return _normalize_with_stats(message, _rule_stats, values), values
+
+    normalized = message
+
+    for rule in NORMALIZATION_RULES:
+        if rule.literal is not None and rule.literal not in normalized:
+            continue
+        if rule.prefilter is not None and rule.prefilter.search(normalized) is None:
+            continue
+        if rule.capture:
+            values.extend(float(v) for v in rule.pattern.findall(normalized))
+        normalized = rule.pattern.sub(rule.token, normalized)
+
+    return normalized, values
+
+
+def _normalize_with_stats(
+    message: str,
+    stats: Dict[str, RuleStats],
+    values: Optional[List[float]] = None,
+) -> str:
+    clock = time.perf_counter
     normalized = message
 
-    for pattern, token in NORMALIZATION_RULES:
-        normalized = pattern.sub(token, normalized)
+    for rule in NORMALIZATION_RULES:
+        s = stats[rule.name]
+        s.evaluated += 1
+        t0 = clock()
+
+        if (
+            (rule.literal is not None and rule.literal not in normalized)
+            or (rule.prefilter is not None and rule.prefilter.search(normalized) is None)
+        ):
+            s.skipped += 1
+            s.seconds += clock() - t0
+            continue
+
+        if values is not None and rule.capture:
+            values.extend(float(v) for v in rule.pattern.findall(normalized))
+        normalized, n = rule.pattern.subn(rule.token, normalized)
+        s.seconds += clock() - t0
+
+        if n:
+            s.matched += 1
+            s.substitutions += n
 
     return normalized
@@ -6,6 +6,39 @@ from typing import Optional
 from .types import ParsedLog
 
 
+# -----------------------------
+# CORRELATION IDS
+# -----------------------------
+
+REQUEST_ID_KEYS = ("request_id", "requestId", "req_id")
+TRACE_ID_KEYS = ("trace_id", "traceId")
+
+# request_id=abc / trace_id=abc embedded in free text
+TEXT_ID_RE = re.compile(r"\b(request_id|req_id|trace_id)=([\w.:-]+)")
+
+
+def _first(fields: dict, keys) -> Optional[str]:
+    for k in keys:
+        value = fields.get(k)
+        if value:
+            return str(value)
+    return None
+
+
+def _field_ids(line: str, fields: dict):
+    # Every key above contains "_id" or "Id"; most lines have neither
+    if "_id" not in line and "Id" not in line:
+        return None, None
+    return _first(fields, REQUEST_ID_KEYS), _first(fields, TRACE_ID_KEYS)
+
+
+def _text_ids(message: str):
+    if "_id=" not in message:
+        return None, None
+    ids = dict(TEXT_ID_RE.findall(message))
+    return ids.get("request_id") or ids.get("req_id"), ids.get("trace_id")
+
+
 # -----------------------------
 # JSON LOG PARSER
 # -----------------------------
@@ -54,11 +87,15 @@ def parse_json(line: str) -> Optional[ParsedLog]:
             or ""
         )
 
+        request_id, trace_id = _field_ids(line, data)
+
         return ParsedLog(
             timestamp=timestamp,
             service=service,
             level=level,
             message=message,
+            request_id=request_id,
+            trace_id=trace_id,
         )
 
     except Exception:
@@ -99,11 +136,16 @@ def parse_timestamped(line: str) -> Optional[ParsedLog]:
             tzinfo=timezone.utc
         )
 
+        message = m.group("msg")
+        request_id, trace_id = _text_ids(message)
+
         return ParsedLog(
             timestamp=timestamp,
             service=m.group("service"),
             level=m.group("level").upper(),
-            message=m.group("msg"),
+            message=message,
+            request_id=request_id,
+            trace_id=trace_id,
         )
 
     except Exception:
@@ -114,7 +156,10 @@ def parse_timestamped(line: str) -> Optional[ParsedLog]:
 # KEY=VALUE (LOGFMT-ISH) PARSER
 # -----------------------------
 
-KV_PAIR_RE = re.compile(r'(\w+)=(".*?"|\S+)')
+# \b anchors keys at word starts: without it a long word with no "="
+# is rescanned from every offset (quadratic). Matches are unchanged,
+# since the leftmost match always starts a word.
+KV_PAIR_RE = re.compile(r'\b(\w+)=(".*?"|\S+)')
 
 
 def parse_kv(line: str) -> Optional[ParsedLog]:
@@ -159,11 +204,17 @@ def parse_kv(line: str) -> Optional[ParsedLog]:
             or ""
         )
 
+        request_id, trace_id = _field_ids(line, fields)
+        if request_id is None and trace_id is None:
+            request_id, trace_id = _text_ids(message)
+
         return ParsedLog(
             timestamp=timestamp,
             service=service,
             level=level,
             message=message,
+            request_id=request_id,
+            trace_id=trace_id,
         )
 
     except Exception:
@@ -1,5 +1,7 @@
-from dataclasses import dataclass
-from datetime import datetime
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
 
 
 @dataclass(frozen=True)
@@ -16,6 +18,8 @@ class ParsedLog:
     service: str
     level: str
     message: str
+    request_id: Optional[str] = None
+    trace_id: Optional[str] = None
 
 
 @dataclass(frozen=True)
@@ -30,9 +34,14 @@ class LogEvent:
     level: str
     template: str
     raw: str
+    request_id: Optional[str] = None
+    trace_id: Optional[str] = None
+    # First number captured during normalization (e.g. a latency in ms)
+    value: Optional[float] = None
 
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Optional
 
 
 @dataclass(frozen=True)
@@ -49,6 +58,8 @@ class ParsedLog:
     service: str
     level: str
     message: str
+    request_id: Optional[str] = None
+    trace_id: Optional[str] = None
 
 
 @dataclass(frozen=True)
@@ -63,3 +74,58 @@ class LogEvent:
     level: str
     template: str
     raw: str
+    request_id: Optional[str] = None
+    trace_id: Optional[str] = None
+    # First number captured during normalization (e.g. a latency in ms)
+    value: Optional[float] = None
+
+
+@dataclass
+class EventBatch:
+    """
+    Columnar form of many LogEvents, produced by ingest_batch().
+
+    One row per parsed line, as parallel arrays. Levels, services and
+    templates are interned per batch: the code columns index into the
+    matching *_names list. Rows are in input order.
+    """
+    epochs: array = field(default_factory=lambda: array("d"))      # epoch seconds
+    levels: array = field(default_factory=lambda: array("I"))      # -> level_names
+    services: array = field(default_factory=lambda: array("I"))    # -> service_names
+    templates: array = field(default_factory=lambda: array("I"))   # -> template_names
+    raw: List[str] = field(default_factory=list)
+    request_ids: List[Optional[str]] = field(default_factory=list)
+    trace_ids: List[Optional[str]] = field(default_factory=list)
+    # Filled only when ingested with capture_values
+    values: List[Optional[float]] = field(default_factory=list)
+
+    level_names: List[str] = field(default_factory=list)
+    service_names: List[str] = field(default_factory=list)
+    template_names: List[str] = field(default_factory=list)
+
+    # Lines offered, and rejected lines by failure reason
+    lines: int = 0
+    failures: Dict[str, int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+    def event(self, row: int) -> LogEvent:
+        return LogEvent(
+            timestamp=datetime.fromtimestamp(self.epochs[row], tz=timezone.utc),
+            service=self.service_names[self.services[row]],
+            level=self.level_names[self.levels[row]],
+            template=self.template_names[self.templates[row]],
+            raw=self.raw[row],
+            request_id=self.request_ids[row],
+            trace_id=self.trace_ids[row],
+            value=self.values[row] if self.values else None,
+        )
+
+    def events(self) -> Iterator[LogEvent]:
+        """
+        Rows as LogEvents, for consumers without a batch API.
+        """
+        for row in range(len(self.epochs)):
+            yield self.event(row)
+